@@ -0,0 +1,54 @@
+"""
+Per-game mistake statistics.
+Iteration 13: Slotted dataclass used inside the per-move analysis loop instead of a
+string-keyed dict; converted to the dict format only when a game's analysis is returned.
+"""
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+STAGES = ('early', 'middle', 'endgame')
+
+# Iteration 13: Per-stage counters summed across games when aggregating
+AGGREGATE_COUNTERS = ('total_moves', 'inaccuracies', 'mistakes', 'blunders', 'missed_opps',
+                      'cp_loss_sum', 'cp_loss_count',
+                      'brilliant_moves', 'neutral_moves', 'mistake_moves')
+
+
+@dataclass(slots=True)
+class StageStats:
+    """Move quality counters for one game stage of a single game."""
+    total_moves: int = 0
+    inaccuracies: int = 0  # Kept for backward compatibility
+    mistakes: int = 0  # Kept for backward compatibility
+    blunders: int = 0  # Kept for backward compatibility
+    missed_opps: int = 0
+    cp_losses: List[int] = field(default_factory=list)  # Bounded by moves_per_game
+    cp_loss_sum: int = 0  # Running sum + count for the mean
+    cp_loss_count: int = 0
+    worst_mistake: Optional[Dict] = None
+    # v2.5: Move quality tracking
+    brilliant_moves: int = 0  # ≥+100 CP gain
+    neutral_moves: int = 0  # -49 to +99 CP
+    mistake_moves: int = 0  # ≤-50 CP loss
+    
+    def to_dict(self) -> Dict:
+        """Dictionary form used by aggregation and the API."""
+        return asdict(self)
+
+
+def new_game_stats() -> Dict[str, StageStats]:
+    """Fresh stats for every game stage."""
+    return {stage: StageStats() for stage in STAGES}
+
+
+def game_stats_to_dict(stats: Dict[str, StageStats]) -> Dict[str, Dict]:
+    """Convert per-stage stats to the per-game analysis dictionary."""
+    return {stage: stage_stats.to_dict() for stage, stage_stats in stats.items()}
+
+
+def new_stage_aggregate() -> Dict:
+    """Empty aggregated stats for one stage, in the API dictionary format."""
+    stage = dict.fromkeys(AGGREGATE_COUNTERS, 0)
+    stage.update(worst_game=None, avg_cp_loss=0, critical_mistake_game=None,
+                 avg_brilliant_per_game=0.0, avg_neutral_per_game=0.0, avg_mistakes_per_game=0.0)
+    return stage
@@ -345,7 +345,16 @@ def analyze_detailed():
                 use_lichess_cloud=config.get('USE_LICHESS_CLOUD', True),
                 lichess_timeout=config.get('LICHESS_API_TIMEOUT', 5.0),
                 max_analysis_games=config.get('MAX_ANALYSIS_GAMES', 10),  # Iteration 12
-                moves_per_game=config.get('MOVES_PER_GAME', 15)  # Iteration 12
+                moves_per_game=config.get('MOVES_PER_GAME', 15),  # Iteration 12
+                engine_workers=config.get('ENGINE_WORKERS', 0),  # Iteration 13
+                book_path=config.get('OPENING_BOOK_PATH') or None,  # Iteration 13
+                min_time_control_seconds=config.get('MIN_TIME_CONTROL_SECONDS', 180),  # Iteration 13
+                engine_threads=config.get('ENGINE_THREADS', 0),  # Iteration 13
+                engine_hash_mb=config.get('ENGINE_HASH_MB', 0),  # Iteration 13
+                eval_db_path=config.get('EVAL_CACHE_DB_PATH') or None,  # Iteration 13
+                tablebase_path=config.get('SYZYGY_PATH') or None,  # Iteration 13
+                keep_engines=config.get('ENGINE_KEEP_ALIVE', False),  # Iteration 13
+                critical_only=config.get('MISTAKE_CRITICAL_ONLY', False)  # Iteration 13
             )
             
             # Format date range for AI advisor context
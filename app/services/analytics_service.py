@@ -50,7 +50,11 @@ class AnalyticsService:
                  openai_model: str = 'gpt-4o-mini', use_lichess_cloud: bool = True,
                  lichess_timeout: float = 5.0, engine_time_limit: float = 0.2,
                  engine_nodes: int = 50000, max_analysis_games: int = 10,
-                 moves_per_game: int = 15):
+                 moves_per_game: int = 15, engine_workers: int = 0,
+                 book_path: Optional[str] = None, min_time_control_seconds: int = 180,
+                 engine_threads: int = 0, engine_hash_mb: int = 0,
+                 eval_db_path: Optional[str] = None, tablebase_path: Optional[str] = None,
+                 keep_engines: bool = False, critical_only: bool = False):
         """
         Initialize analytics service.
         
@@ -66,6 +70,15 @@ class AnalyticsService:
             engine_nodes: Node limit for Stockfish (default: 50000, Iteration 12)
             max_analysis_games: Maximum games to analyze (default: 10, Iteration 12)
             moves_per_game: Moves to analyze per game (default: 15, Iteration 12)
+            engine_workers: Parallel Stockfish processes (default: 0 = one per CPU core, Iteration 13)
+            book_path: Optional polyglot opening book path (Iteration 13)
+            min_time_control_seconds: Skip faster games, e.g. bullet (default: 180, Iteration 13)
+            engine_threads: Stockfish Threads per engine (default: 0 = auto, Iteration 13)
+            engine_hash_mb: Stockfish Hash per engine in MB (default: 0 = auto, Iteration 13)
+            eval_db_path: Optional SQLite file for persistent evaluations (Iteration 13)
+            tablebase_path: Optional Syzygy tablebase directory (Iteration 13)
+            keep_engines: Keep Stockfish processes between requests (Iteration 13)
+            critical_only: Only engine-search games lost by resignation (Iteration 13)
         """
         self.mistake_analyzer = MistakeAnalysisService(
             stockfish_path=stockfish_path,
@@ -76,7 +89,16 @@ class AnalyticsService:
             use_lichess_cloud=use_lichess_cloud,
             lichess_timeout=lichess_timeout,
             max_analysis_games=max_analysis_games,
-            moves_per_game=moves_per_game
+            moves_per_game=moves_per_game,
+            engine_workers=engine_workers,
+            book_path=book_path,
+            min_time_control_seconds=min_time_control_seconds,
+            engine_threads=engine_threads,
+            engine_hash_mb=engine_hash_mb,
+            eval_db_path=eval_db_path,
+            tablebase_path=tablebase_path,
+            keep_engines=keep_engines,
+            critical_only=critical_only
         )
         self.ai_advisor = ChessAdvisorService(
             api_key=openai_api_key,
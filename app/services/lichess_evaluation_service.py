@@ -3,8 +3,11 @@ Lichess Cloud Evaluation Service for fast chess position evaluation.
 Iteration 11: Performance optimization using Lichess Cloud API
 """
 import requests
+from collections import OrderedDict
 from typing import Optional
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,8 @@ class LichessEvaluationService:
     
     BASE_URL = "https://lichess.org/api/cloud-eval"
     TIMEOUT = 5.0  # 5 second timeout
+    MISSING_CACHE_SIZE = 10_000  # Iteration 13: Remembered misses before evicting the oldest
+    RATE_LIMIT_BACKOFF = 60.0  # Iteration 13: Seconds without requests after a 429 response
     
     def __init__(self, timeout: float = 5.0):
         """
@@ -23,6 +28,13 @@ class LichessEvaluationService:
             timeout: API request timeout in seconds (default: 5.0)
         """
         self.timeout = timeout
+        # Iteration 13: FENs the cloud has no evaluation for (not retried; errors are),
+        # least recently used first. Lookups run on several threads, so the misses and
+        # the stats are only touched under the lock
+        self._missing: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Iteration 13: Monotonic time until which lookups are not sent (rate limited)
+        self._backoff_until = 0.0
         self.stats = {
             'api_calls': 0,
             'hits': 0,
@@ -39,8 +51,15 @@ class LichessEvaluationService:
             
         Returns:
             Centipawn score (positive = advantage for side to move), or None if not found
+            (or while backing off after a 429 response)
         """
-        self.stats['api_calls'] += 1
+        with self._lock:
+            if fen in self._missing:
+                self._missing.move_to_end(fen)
+                return None
+            if time.monotonic() < self._backoff_until:
+                return None
+            self.stats['api_calls'] += 1
         
         try:
             params = {
@@ -54,6 +73,15 @@ class LichessEvaluationService:
                 timeout=self.timeout
             )
             
+            # Iteration 13: Rate limited; the position is not a miss, so it is not
+            # remembered, but no lookup is sent until the back-off window has passed
+            if response.status_code == 429:
+                with self._lock:
+                    self._backoff_until = time.monotonic() + self.RATE_LIMIT_BACKOFF
+                    self.stats['errors'] += 1
+                logger.warning(f"Lichess API rate limit hit, pausing lookups for {self.RATE_LIMIT_BACKOFF:.0f}s")
+                return None
+            
             if response.status_code == 200:
                 data = response.json()
                 
@@ -64,7 +92,7 @@ class LichessEvaluationService:
                     # Get centipawn score
                     if "cp" in pv_data:
                         cp_score = pv_data["cp"]
-                        self.stats['hits'] += 1
+                        self._count('hits')
                         logger.debug(f"Lichess eval for {fen[:30]}...: {cp_score} cp (depth {data.get('depth', 'N/A')})")
                         return cp_score
                     
@@ -74,28 +102,38 @@ class LichessEvaluationService:
                         # Convert mate to centipawn equivalent
                         # Positive mate = winning, negative = losing
                         cp_score = 10000 if mate_in > 0 else -10000
-                        self.stats['hits'] += 1
+                        self._count('hits')
                         logger.debug(f"Lichess eval for {fen[:30]}...: Mate in {mate_in}")
                         return cp_score
                         
             # Position not found in cloud database
-            self.stats['misses'] += 1
+            with self._lock:
+                if response.status_code in (200, 404):
+                    self._missing[fen] = None
+                    while len(self._missing) > self.MISSING_CACHE_SIZE:
+                        self._missing.popitem(last=False)
+                self.stats['misses'] += 1
             logger.debug(f"Position not in Lichess cloud: {fen[:30]}...")
             return None
             
         except requests.Timeout:
-            self.stats['errors'] += 1
+            self._count('errors')
             logger.warning("Lichess API timeout")
             return None
         except requests.RequestException as e:
-            self.stats['errors'] += 1
+            self._count('errors')
             logger.warning(f"Lichess API request error: {e}")
             return None
         except Exception as e:
-            self.stats['errors'] += 1
+            self._count('errors')
             logger.error(f"Lichess API error: {e}")
             return None
     
+    def _count(self, name: str):
+        """Increment a usage counter (Iteration 13: lookups run concurrently)."""
+        with self._lock:
+            self.stats[name] += 1
+    
     def get_stats(self) -> dict:
         """
         Get API usage statistics.
@@ -103,17 +141,20 @@ class LichessEvaluationService:
         Returns:
             Dictionary with api_calls, hits, misses, errors counts and hit_rate percentage
         """
-        hit_rate = (self.stats['hits'] / self.stats['api_calls'] * 100) if self.stats['api_calls'] > 0 else 0
+        with self._lock:
+            stats = dict(self.stats)
+        hit_rate = (stats['hits'] / stats['api_calls'] * 100) if stats['api_calls'] > 0 else 0
         return {
-            **self.stats,
+            **stats,
             'hit_rate': round(hit_rate, 2)
         }
     
     def reset_stats(self):
         """Reset API usage statistics."""
-        self.stats = {
-            'api_calls': 0,
-            'hits': 0,
-            'misses': 0,
-            'errors': 0
-        }
+        with self._lock:
+            self.stats = {
+                'api_calls': 0,
+                'hits': 0,
+                'misses': 0,
+                'errors': 0
+            }
@@ -4,18 +4,144 @@ Milestone 8: Game Stage Mistake Analysis
 PRD v2.1: Updated critical mistake game link criteria (lost by resignation only)
 PRD v2.10 (Iteration 11): Lichess Cloud API integration for 10-20x performance improvement
 PRD v2.11 (Iteration 12): Node-limited search + batch FEN evaluation for 1 vCPU optimization
+Iteration 13: Parallel game analysis across a pool of Stockfish processes
+Iteration 13: Transposition cache for position evaluations
+Iteration 13: Optional SQLite-backed evaluation cache that persists across restarts
+Iteration 13: Optional polyglot opening book to skip engine work on book moves
+Iteration 13: Optional Syzygy tablebases score endgames with few pieces without a search
+Iteration 13: Mainline-only PGN parsing (no game tree)
+Iteration 13: Bullet and very short games are filtered out before engine work
 """
 import chess
 import chess.engine
 import chess.pgn
+import chess.polyglot
+import heapq
+import os
+import queue
+import re
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import StringIO
-from typing import Dict, List, Optional, Tuple
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Sized, Tuple
 from collections import defaultdict
 import logging
+from app.models.mistake_stats import (AGGREGATE_COUNTERS, STAGES, StageStats, game_stats_to_dict,
+                                      new_game_stats, new_stage_aggregate)
 from app.services.lichess_evaluation_service import LichessEvaluationService
+from app.utils.eval_cache import EvalCacheDB, get_cached_eval, store_eval
+from app.utils.idle_engines import checkout_idle_engine, park_engine
+from app.utils.opening_book import get_book_reader
+from app.utils.tablebase import get_tablebase
+from app.utils.pgn_archive import archive_game_record, iter_archive_pgns
 
 logger = logging.getLogger(__name__)
 
+# Iteration 13: Cheap PGN scans used to filter games without parsing them
+TIME_CONTROL_HEADER_RE = re.compile(r'\[TimeControl "([^"]*)"\]')
+PGN_HEADER_RE = re.compile(r'^\[[^\n]*\]\s*$', re.MULTILINE)
+PGN_COMMENT_RE = re.compile(r'\{[^}]*\}')
+MOVE_NUMBER_RE = re.compile(r'(?<![\d.])\d+\.(?!\.)')  # "12." but not "12..." or dates
+FEN_HEADER_RE = re.compile(r'^\[FEN "([^"]*)"\]', re.MULTILINE)
+MOVE_NUMBER_PREFIX_RE = re.compile(r'^\d+\.+')
+RESULT_TOKENS = frozenset(('1-0', '0-1', '1/2-1/2', '*'))
+
+# Iteration 13: Critical-game criteria (PRD v2.1), checked once per game
+LOSS_RESULTS = frozenset(('checkmated', 'timeout', 'resigned', 'abandoned', 'lose'))  # Chess.com
+RESIGNATION_RE = re.compile('resign', re.IGNORECASE)
+
+
+class MainlineMovesVisitor(chess.pgn.BaseVisitor):
+    """
+    PGN visitor that records only the starting position and mainline moves.
+    Iteration 13: Avoids allocating a GameNode tree (comments, NAGs, variations)
+    when all the analysis needs is the mainline.
+    """
+    
+    def begin_game(self):
+        self.board = None
+        self.moves = []
+    
+    def visit_board(self, board: chess.Board):
+        # First call is the starting position (honours FEN/SetUp headers)
+        if self.board is None:
+            self.board = board.copy(stack=False)
+    
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        self.moves.append(move)
+    
+    def begin_variation(self):
+        return chess.pgn.SKIP
+    
+    def handle_error(self, error: Exception):
+        logger.warning(f"PGN parse error: {error}")
+    
+    def result(self) -> Tuple[chess.Board, List[chess.Move]]:
+        return self.board or chess.Board(), self.moves
+
+
+def parse_mainline(pgn_string: str) -> Optional[Tuple[chess.Board, List[chess.Move]]]:
+    """
+    Parse a PGN's starting position and mainline moves.
+    Iteration 13: Plain movetext (Chess.com exports: headers, clock comments, mainline
+    only) is tokenized directly and each SAN is parsed on a single board, skipping the
+    chess.pgn tokenizer/visitor machinery. Anything else (variations, `;` comments,
+    variant games, unparsable tokens) falls back to MainlineMovesVisitor.
+    
+    Args:
+        pgn_string: PGN string of a single game
+        
+    Returns:
+        (starting board, mainline moves), or None if the PGN contains no game
+    """
+    movetext = PGN_COMMENT_RE.sub(' ', PGN_HEADER_RE.sub('', pgn_string))
+    if pgn_string.strip() and '(' not in movetext and ';' not in movetext \
+            and '[Variant ' not in pgn_string:
+        try:
+            fen = FEN_HEADER_RE.search(pgn_string)
+            board = chess.Board(fen.group(1)) if fen else chess.Board()
+            start_board = board.copy(stack=False)
+            moves = []
+            for token in movetext.split():
+                if token in RESULT_TOKENS:
+                    break
+                if token[0].isdigit():
+                    token = MOVE_NUMBER_PREFIX_RE.sub('', token)  # "12." / "12..." / "12.e4"
+                if not token or token[0] == '$':
+                    continue  # Bare move number or NAG
+                move = board.parse_san(token.rstrip('!?'))
+                board.push(move)
+                moves.append(move)
+            return start_board, moves
+        except ValueError:
+            pass  # Not plain movetext, use the full PGN parser
+    
+    return chess.pgn.read_game(StringIO(pgn_string), Visitor=MainlineMovesVisitor)
+
+
+class EvenSample:
+    """
+    Evenly spaced sample of a stream whose length is not known up front.
+    Iteration 13: Keeps every `stride`-th item; when more than 2 * size items are
+    kept, every other one is dropped and the stride doubles. Deterministic, and the
+    result stays spread across the whole stream (e.g. the whole time period).
+    """
+    
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.stride = 1
+        self.seen = 0
+        self.items: List = []
+    
+    def add(self, item):
+        if self.seen % self.stride == 0:
+            self.items.append(item)
+            if len(self.items) > 2 * self.size:
+                del self.items[1::2]
+                self.stride *= 2
+        self.seen += 1
+
 
 class MistakeAnalysisService:
     """Service for analyzing chess game mistakes using Stockfish engine."""
@@ -24,24 +150,84 @@ class MistakeAnalysisService:
     EARLY_GAME_END = 7      # Moves 1-7 per player
     MIDDLE_GAME_END = 20    # Moves 8-20 per player
     
+    # Iteration 13: Stage per full move number (index 0 unused); longer games are endgame
+    STAGE_BY_MOVE = (
+        ('early',) * (EARLY_GAME_END + 1)
+        + ('middle',) * (MIDDLE_GAME_END - EARLY_GAME_END)
+        + ('endgame',) * 200
+    )
+    
     # Mistake classification thresholds (centipawns)
     INACCURACY_THRESHOLD = 50
     MISTAKE_THRESHOLD = 100
     BLUNDER_THRESHOLD = 200
     
+    # Iteration 13: bisect buckets for classification (index = bisect_right(MISTAKE_BUCKETS, cp_loss))
+    MISTAKE_BUCKETS = (INACCURACY_THRESHOLD, MISTAKE_THRESHOLD, BLUNDER_THRESHOLD)
+    MISTAKE_TYPES = (None, 'inaccuracy', 'mistake', 'blunder')
+    MISTAKE_COUNTERS = (None, 'inaccuracies', 'mistakes', 'blunders')
+    
     # PRD v2.3: Optimized for speed (3-4x faster) with strategic move sampling
     EARLY_STOP_THRESHOLD = 300  # Skip detailed analysis for blunders >300 CP
+    EARLY_STOP_MIN_DEPTH = 8    # Iteration 13: Depth a post-move search must reach before stopping early
     SKIP_EVAL_THRESHOLD = 600   # Skip analyzing heavily winning/losing positions
     
+    # Iteration 13: Material gap (CP) at which a position is searched with the reduced
+    # budget; quiet positions (no check, no capture pending) qualify from a smaller gap
+    DECIDED_MATERIAL_THRESHOLD = 1500
+    QUIET_DECIDED_MATERIAL_THRESHOLD = SKIP_EVAL_THRESHOLD + 200
+    PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330,
+                    chess.ROOK: 500, chess.QUEEN: 900}
+    
+    # Iteration 13: Stockfish Hash bounds when sized automatically (MB per engine)
+    DEFAULT_HASH_MB = 128
+    MIN_HASH_MB = 16
+    MAX_HASH_MB = 512
+    # Iteration 13: Engines kept in the auto-sized pool even on one core, so one engine
+    # searches while the other's result is read and the next position is sent
+    PIPELINE_ENGINES = 2
+    # Iteration 13: Concurrent Lichess Cloud lookups per batch (network-bound, no engine held)
+    CLOUD_LOOKUP_WORKERS = 8
+    # Iteration 13: Sent to every engine along with Threads/Hash (skipped if not exposed)
+    ENGINE_FIXED_OPTIONS = {'UCI_LimitStrength': False, 'Use NNUE': True}
+    
+    # Iteration 13: Games below these limits carry little signal and are skipped
+    MIN_GAME_MOVES = 10  # Full moves
+    
+    # Iteration 13: Centipawn value of a forced mate (also used for finished games)
+    MATE_SCORE = 10000
+    # Iteration 13: Halfmove clock from which the 50-move rule can shape the score, so the
+    # evaluation depends on the game's history and is not cached (nor is a repetition)
+    HISTORY_HALFMOVE_CLOCK = 90
+    # Iteration 13: Syzygy probing (positions with at most this many pieces, incl. kings);
+    # a tablebase win scores below any mate the engine can report
+    TABLEBASE_MAX_PIECES = 7
+    TABLEBASE_WIN_SCORE = MATE_SCORE - 1000
+    
+    # Iteration 13: Reduced search budget for quiet positions (no check, no captures)
+    # and for opening-stage positions
+    QUIET_DEPTH = 8
+    QUIET_TIME = 0.3
+    QUIET_NODES_DIVISOR = 4
+    REDUCED_BUDGET_STAGES = ('early',)  # Stages searched with the reduced budget regardless
+    
     # Strategic move sampling (Iteration 12: Reduced to 15 moves for 1 vCPU)
     # 5 early + 5 middle + 5 endgame = 15 moves per game
     MOVES_PER_STAGE = 5           # Moves to analyze per stage
     MAX_MOVES_PER_GAME = 15       # Maximum moves to analyze per game (3 stages × 5)
+    # Iteration 13: Resignation losses only sample their final moves (~20 plies), where
+    # the critical mistake behind the resignation is
+    RESIGNED_TAIL_MOVES = 10
     
     def __init__(self, stockfish_path: str = 'stockfish', engine_depth: int = 10, 
                  time_limit: float = 0.5, engine_nodes: int = 50000, enabled: bool = True, 
                  use_lichess_cloud: bool = True, lichess_timeout: float = 5.0,
-                 max_analysis_games: int = 10, moves_per_game: int = 15):
+                 max_analysis_games: int = 10, moves_per_game: int = 15,
+                 engine_workers: int = 0, book_path: Optional[str] = None,
+                 min_time_control_seconds: int = 180, engine_threads: int = 0,
+                 engine_hash_mb: int = 0, eval_db_path: Optional[str] = None,
+                 tablebase_path: Optional[str] = None, keep_engines: bool = False,
+                 critical_only: bool = False):
         """
         Initialize mistake analysis service.
         
@@ -55,6 +241,15 @@ class MistakeAnalysisService:
             lichess_timeout: Timeout for Lichess API calls in seconds (default: 5.0)
             max_analysis_games: Maximum games to analyze (default: 10, Iteration 12)
             moves_per_game: Moves to analyze per game (default: 15, Iteration 12)
+            engine_workers: Stockfish processes for parallel game analysis (default: 0 = one per CPU core, at least PIPELINE_ENGINES)
+            book_path: Optional polyglot (.bin) opening book; early-game book moves skip engine analysis
+            min_time_control_seconds: Skip games with a shorter base time, e.g. bullet (default: 180, 0 = off)
+            engine_threads: Stockfish Threads per engine (default: 0 = CPU cores / engine workers)
+            engine_hash_mb: Stockfish Hash per engine in MB (default: 0 = sized from available RAM)
+            eval_db_path: Optional SQLite file that persists evaluations across restarts
+            tablebase_path: Optional Syzygy directory; positions with few pieces skip the engine
+            keep_engines: Park stopped engines for the next service instead of quitting them
+            critical_only: Default for aggregate_mistake_analysis(critical_only=...)
         """
         self.stockfish_path = stockfish_path
         self.engine_depth = engine_depth
@@ -64,34 +259,329 @@ class MistakeAnalysisService:
         self.use_lichess_cloud = use_lichess_cloud
         self.max_analysis_games = max_analysis_games  # Iteration 12
         self.moves_per_game = moves_per_game  # Iteration 12
+        self.engine_workers = engine_workers  # Iteration 13: 0 = auto (CPU count)
+        self.book_path = book_path  # Iteration 13: polyglot opening book
+        self.book = None
+        self.min_time_control_seconds = min_time_control_seconds  # Iteration 13: game filter
+        self.engine_threads = engine_threads  # Iteration 13: 0 = auto
+        self.engine_hash_mb = engine_hash_mb  # Iteration 13: 0 = auto
+        self.eval_db_path = eval_db_path  # Iteration 13: persistent eval cache
+        self.eval_db: Optional[EvalCacheDB] = None
+        self.tablebase_path = tablebase_path  # Iteration 13: Syzygy endgame tablebases
+        self.tablebase = None
+        self.keep_engines = keep_engines  # Iteration 13: process-wide idle engines
+        self.critical_only = critical_only  # Iteration 13: search resignation losses only
+        # Engines are only handed between services started with the same settings
+        self._engine_key = (stockfish_path, engine_workers, engine_threads, engine_hash_mb)
         self.engine = None
+        self._engines: List[chess.engine.SimpleEngine] = []  # Iteration 13: engine pool
+        self._engine_pool: Optional[queue.Queue] = None  # Idle engines while a batch runs
+        self._position_executor: Optional[ThreadPoolExecutor] = None  # Position-level searches
+        self._cloud_executor: Optional[ThreadPoolExecutor] = None  # Lichess Cloud prefetch
+        self._resolved_engine_options: Optional[Dict[str, int]] = None  # Shared by pooled engines
+        self._pool_size: Optional[int] = None  # Engines the current run starts (sizes Threads)
+        
+        # Iteration 13: Search settings are part of the eval cache key so evaluations
+        # from a shallower search are never reused for a deeper one. The effective limits
+        # are used (not the raw settings), since the mode also depends on use_lichess_cloud
+        self._search_signature = (stockfish_path, repr(self._search_limit(False)),
+                                  repr(self._search_limit(True)))
+        self._db_signature = repr(self._search_signature)
         
         # Initialize Lichess Cloud service (Iteration 11)
         self.lichess_service = LichessEvaluationService(timeout=lichess_timeout) if use_lichess_cloud else None
         
+    def __enter__(self) -> 'MistakeAnalysisService':
+        """Start the engine once for a series of analysis calls (Iteration 13)."""
+        self.warmup()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop the engine pool when leaving the `with` block (Iteration 13)."""
+        self.shutdown()
+    
+    def warmup(self) -> bool:
+        """
+        Start the engine ahead of time so it is reused by later aggregate calls.
+        Iteration 13: Process spawn + network load is paid once per service instead of
+        once per aggregate_mistake_analysis() call.
+        
+        Returns:
+            True if an engine is running
+        """
+        if self.engine is None:
+            self.engine = self._start_engine()
+        return self.engine is not None
+    
+    def shutdown(self):
+        """Stop the engine (and any pooled engines) started by warmup()."""
+        self._stop_engine()
+    
     def _start_engine(self) -> Optional[chess.engine.SimpleEngine]:
         """Start Stockfish engine."""
         if not self.enabled:
             return None
+        
+        # Iteration 13: Reuse an engine parked by an earlier service (already configured)
+        engine = checkout_idle_engine(self._engine_key) if self.keep_engines else None
+        if engine is None:
+            try:
+                engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+                logger.info(f"Stockfish engine started: {self.stockfish_path}")
+            except Exception as e:
+                logger.error(f"Failed to start Stockfish engine: {e}")
+                return None
             
+            self._configure_engine(engine)
+        
+        self._open_book()
+        self._open_tablebase()
+        self._open_eval_db()
+        return engine
+    
+    def _configure_engine(self, engine: chess.engine.SimpleEngine):
+        """
+        Apply Threads, Hash and the fixed strength/NNUE options to a freshly started engine.
+        Iteration 13: Threads is set before Hash (Stockfish re-allocates the hash per thread
+        count); options the engine does not expose are skipped.
+        
+        Args:
+            engine: Started Stockfish engine
+        """
+        # Iteration 13: Resolved once, so engines started later in the pool are not sized
+        # from the free RAM left over after earlier engines allocated their hash
+        if self._resolved_engine_options is None:
+            self._resolved_engine_options = {**self._engine_options(self._pool_size), **self.ENGINE_FIXED_OPTIONS}
+        options = {name: value for name, value in self._resolved_engine_options.items()
+                   if name in engine.options}
+        if not options:
+            return
+        
         try:
-            engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
-            logger.info(f"Stockfish engine started: {self.stockfish_path}")
-            return engine
+            engine.configure(options)
+            logger.info(f"Stockfish configured: {options}")
+        except chess.engine.EngineError as e:
+            logger.warning(f"Could not configure Stockfish options {options}: {e}")
+    
+    def _engine_options(self, pool_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Resolve Threads/Hash for each engine process.
+        Iteration 13: The cores are split across the engines of the pool, so a full pool
+        gets Threads=1 and a smaller one (e.g. a single game) gets several threads per
+        engine. Hash is split across the planned engines (at least PIPELINE_ENGINES when
+        the pool is sized automatically).
+        
+        Args:
+            pool_size: Engines the run starts (default: engine_workers, or one per core)
+            
+        Returns:
+            Ordered UCI options: {'Threads': ..., 'Hash': ...}
+        """
+        cores = os.cpu_count() or 1
+        if pool_size is None:
+            pool_size = self.engine_workers if self.engine_workers > 0 else cores
+        planned_engines = max(1, min(pool_size, cores))
+        threads = self._threads_per_engine(pool_size)
+        if self.engine_workers <= 0:
+            planned_engines = max(planned_engines, self.PIPELINE_ENGINES)  # Hash is split across both
+        
+        hash_mb = self.engine_hash_mb
+        if hash_mb <= 0:
+            available_mb = self._available_memory_mb()
+            if available_mb is None:
+                hash_mb = self.DEFAULT_HASH_MB
+            else:
+                # Leave 3/4 of free RAM for the app and OS
+                hash_mb = available_mb // (planned_engines * 4)
+            hash_mb = max(self.MIN_HASH_MB, min(self.MAX_HASH_MB, hash_mb))
+        
+        return {'Threads': threads, 'Hash': hash_mb}
+    
+    def _threads_per_engine(self, pool_size: int) -> int:
+        """Stockfish Threads for each of `pool_size` engines (Iteration 13: engine_threads, or cores / pool)."""
+        if self.engine_threads > 0:
+            return self.engine_threads
+        cores = os.cpu_count() or 1
+        return max(1, cores // max(1, min(pool_size, cores)))
+    
+    @staticmethod
+    def _available_memory_mb() -> Optional[int]:
+        """Free physical memory in MB, or None where sysconf is unavailable (e.g. Windows)."""
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        except (AttributeError, ValueError, OSError):
+            return None
+    
+    def _open_book(self):
+        """Attach the polyglot opening book, if configured (Iteration 13: shared per process)."""
+        if not self.book_path or self.book is not None:
+            return
+        
+        try:
+            self.book = get_book_reader(self.book_path)
+            logger.info(f"Opening book loaded: {self.book_path}")
+        except Exception as e:
+            logger.error(f"Failed to open opening book: {e}")
+    
+    def _close_book(self):
+        """Detach the opening book (the shared reader stays open for later services)."""
+        self.book = None
+    
+    def _open_tablebase(self):
+        """Attach the Syzygy tablebases, if configured (Iteration 13: shared per process)."""
+        if not self.tablebase_path or self.tablebase is not None:
+            return
+        
+        try:
+            self.tablebase = get_tablebase(self.tablebase_path)
+            logger.info(f"Syzygy tablebases loaded: {self.tablebase_path}")
         except Exception as e:
-            logger.error(f"Failed to start Stockfish engine: {e}")
+            logger.error(f"Failed to open Syzygy tablebases: {e}")
+    
+    def _close_tablebase(self):
+        """Detach the tablebases (the shared tablebase stays open for later services)."""
+        self.tablebase = None
+    
+    def _probe_tablebase(self, board: chess.Board) -> Optional[int]:
+        """
+        Score a position from the Syzygy tablebases (Iteration 13).
+        Cursed wins and blessed losses are draws under the 50-move rule, so they score 0.
+        
+        Args:
+            board: Chess board position
+            
+        Returns:
+            Centipawns from the side to move's perspective, or None if not in the tablebases
+        """
+        if self.tablebase is None or chess.popcount(board.occupied) > self.TABLEBASE_MAX_PIECES:
+            return None
+        
+        try:
+            wdl = self.tablebase.get_wdl(board)
+        except Exception as e:
+            logger.debug(f"Tablebase probe failed: {e}")
+            return None
+        if wdl is None:
             return None
+        if wdl == 2:
+            return self.TABLEBASE_WIN_SCORE
+        if wdl == -2:
+            return -self.TABLEBASE_WIN_SCORE
+        return 0
+    
+    def _open_eval_db(self):
+        """Open the persistent evaluation cache, if configured (Iteration 13)."""
+        if not self.eval_db_path or self.eval_db is not None:
+            return
+        
+        try:
+            self.eval_db = EvalCacheDB(self.eval_db_path)
+            logger.info(f"Evaluation cache database opened: {self.eval_db_path}")
+        except Exception as e:
+            logger.error(f"Failed to open evaluation cache database: {e}")
+    
+    def _close_eval_db(self):
+        """Commit and close the persistent evaluation cache."""
+        if self.eval_db is not None:
+            try:
+                self.eval_db.close()
+            except Exception as e:
+                logger.error(f"Error closing evaluation cache database: {e}")
+            finally:
+                self.eval_db = None
+    
+    def _is_book_move(self, board: chess.Board, move: chess.Move) -> bool:
+        """
+        Check whether a move is an opening book move for the given position.
+        Iteration 13: Book moves have ~0 CP loss by construction, so they need no engine analysis.
+        
+        Args:
+            board: Position before the move
+            move: Move played
+            
+        Returns:
+            True if the book lists the move for this position
+        """
+        if self.book is None:
+            return False
+        
+        try:
+            return any(entry.move == move for entry in self.book.find_all(board))
+        except Exception as e:
+            logger.debug(f"Opening book lookup failed: {e}")
+            return False
+    
+    def _start_engine_pool(self, size: int) -> int:
+        """
+        Start additional Stockfish processes so the pool holds `size` engines.
+        Iteration 13: Games are independent, so each worker gets its own engine
+        process (sharing the cores, see _engine_options) and games are analyzed in parallel.
+        
+        Args:
+            size: Desired number of engines (including the primary engine)
+            
+        Returns:
+            Number of engines available in the pool
+        """
+        if self.engine and self.engine not in self._engines:
+            self._engines.append(self.engine)
+        
+        while len(self._engines) < size:
+            engine = self._start_engine()
+            if not engine:
+                break
+            self._engines.append(engine)
+        
+        return len(self._engines)
+    
+    def _resolve_worker_count(self, total_games: int) -> int:
+        """Number of parallel engine workers for a batch of games (Iteration 13)."""
+        if self.engine_workers > 0:
+            return max(1, min(self.engine_workers, total_games))
+        return max(self.PIPELINE_ENGINES, min(os.cpu_count() or 1, total_games))
+    
+    def _fit_pool_threads(self, pool_size: int):
+        """
+        Give every pooled engine its share of the cores for a pool of `pool_size` engines.
+        Iteration 13: Engines started before the pool size was known (warmup(), parked
+        engines) are re-configured; python-chess only sends options whose value changed.
+        
+        Args:
+            pool_size: Engines in the pool
+        """
+        threads = self._threads_per_engine(pool_size)
+        if self._resolved_engine_options is not None:
+            self._resolved_engine_options['Threads'] = threads
+        for engine in self._engines:
+            if 'Threads' not in engine.options:
+                continue
+            try:
+                engine.configure({'Threads': threads})
+            except chess.engine.EngineError as e:
+                logger.warning(f"Could not set Stockfish Threads={threads}: {e}")
     
     def _stop_engine(self):
-        """Stop Stockfish engine."""
-        if self.engine:
+        """Stop Stockfish engine (and any pooled engines)."""
+        engines = list(self._engines)
+        if self.engine and self.engine not in engines:
+            engines.append(self.engine)
+        
+        # Iteration 13: Up to one engine per core is kept warm for the next service
+        max_idle = max(self.PIPELINE_ENGINES, os.cpu_count() or 1)
+        for engine in engines:
+            if self.keep_engines and park_engine(self._engine_key, engine, max_idle):
+                continue
             try:
-                self.engine.quit()
+                engine.quit()
                 logger.info("Stockfish engine stopped")
             except Exception as e:
                 logger.error(f"Error stopping engine: {e}")
-            finally:
-                self.engine = None
+        
+        self._engines = []
+        self.engine = None
+        self._close_book()
+        self._close_tablebase()
+        self._close_eval_db()
     
     def _get_stage(self, move_number: int) -> str:
         """
@@ -103,12 +593,9 @@ class MistakeAnalysisService:
         Returns:
             'early', 'middle', or 'endgame'
         """
-        if move_number <= self.EARLY_GAME_END:
-            return 'early'
-        elif move_number <= self.MIDDLE_GAME_END:
-            return 'middle'
-        else:
-            return 'endgame'
+        if move_number < len(self.STAGE_BY_MOVE):
+            return self.STAGE_BY_MOVE[move_number]
+        return 'endgame'
     
     def _classify_mistake(self, cp_loss: int) -> Optional[str]:
         """
@@ -120,86 +607,519 @@ class MistakeAnalysisService:
         Returns:
             'inaccuracy', 'mistake', 'blunder', or None
         """
-        if cp_loss >= self.BLUNDER_THRESHOLD:
-            return 'blunder'
-        elif cp_loss >= self.MISTAKE_THRESHOLD:
-            return 'mistake'
-        elif cp_loss >= self.INACCURACY_THRESHOLD:
-            return 'inaccuracy'
+        # Iteration 13: Threshold lookup shared with _classify_logged_mistakes
+        return self.MISTAKE_TYPES[bisect_right(self.MISTAKE_BUCKETS, cp_loss)]
+    
+    def _classify_logged_mistakes(self, mistakes: Dict[str, StageStats],
+                                  mistake_log: List[Tuple[str, int, int]]):
+        """
+        Bucketize a game's significant CP losses and update per-stage counters.
+        Iteration 13: Classification runs once per game after the engine loop, using a
+        bisect over the sorted thresholds instead of an if/elif chain per move.
+        
+        Args:
+            mistakes: Per-stage game stats to update in place
+            mistake_log: (stage, move_number, cp_loss) tuples in move order
+        """
+        # Iteration 13: Lookup tables bound to locals (no attribute lookups per mistake)
+        buckets = self.MISTAKE_BUCKETS
+        counters = self.MISTAKE_COUNTERS
+        types = self.MISTAKE_TYPES
+        # Iteration 13: Worst loss per stage as (cp_loss, move_number, bucket); the
+        # worst_mistake dicts are built once after the loop
+        worst_by_stage = {}
+        for stage, move_number, cp_loss in mistake_log:
+            bucket = bisect_right(buckets, cp_loss)  # 0 = below inaccuracy, 3 = blunder
+            stage_data = mistakes[stage]
+            
+            counter = counters[bucket]
+            if counter:
+                setattr(stage_data, counter, getattr(stage_data, counter) + 1)
+            
+            stage_data.cp_losses.append(cp_loss)
+            stage_data.cp_loss_sum += cp_loss
+            stage_data.cp_loss_count += 1
+            
+            # Track worst mistake (first occurrence wins ties)
+            worst = worst_by_stage.get(stage)
+            if worst is None or cp_loss > worst[0]:
+                worst_by_stage[stage] = (cp_loss, move_number, bucket)
+        
+        for stage, (cp_loss, move_number, bucket) in worst_by_stage.items():
+            stage_data = mistakes[stage]
+            worst = stage_data.worst_mistake
+            if worst is None or cp_loss > worst['cp_loss']:
+                stage_data.worst_mistake = {
+                    'move_number': move_number,
+                    'cp_loss': cp_loss,
+                    'type': types[bucket] or 'mistake'
+                }
+    
+    def _evaluate_position(self, board: chess.Board,
+                           engine: Optional[chess.engine.SimpleEngine] = None,
+                           full_depth: bool = False) -> Optional[int]:
+        """
+        Evaluate position, reusing cached evaluations of transposed/repeated positions.
+        Iteration 13: Transposition cache shared across games and requests.
+        Iteration 13: Quiet positions get a reduced search unless full_depth is requested.
+        
+        Args:
+            board: Chess board position
+            engine: Stockfish engine to use (default: self.engine)
+            full_depth: Always use the full search budget (used to confirm mistakes)
+            
+        Returns:
+            Evaluation in centipawns (from current player's perspective), or None if error
+        """
+        return self._evaluate_with_best_move(board, engine, full_depth)[0]
+    
+    def _evaluate_with_best_move(self, board: chess.Board,
+                                 engine: Optional[chess.engine.SimpleEngine] = None,
+                                 full_depth: bool = False,
+                                 reduced: bool = False,
+                                 stop_above: Optional[int] = None,
+                                 stop_beyond: Optional[int] = None) -> Tuple[Optional[int], Optional[chess.Move]]:
+        """
+        Evaluate position and return the engine's best move along with the score.
+        Iteration 13: The best move lets the caller skip the post-move search when the
+        player found it (the position after the best move keeps the same evaluation).
+        
+        Args:
+            board: Chess board position
+            engine: Stockfish engine to use (default: self.engine)
+            full_depth: Always use the full search budget (used to confirm mistakes)
+            reduced: Use the reduced budget even for tactical positions (stage-adaptive depth)
+            stop_above: Stop the search early once the score exceeds this value (see _search);
+                such evaluations are not cached
+            stop_beyond: Stop the search early once |score| exceeds this value (see _search);
+                such evaluations are not cached either
+            
+        Returns:
+            (centipawns from current player's perspective or None if error,
+             best move or None if unknown, e.g. Lichess Cloud evaluations)
+        """
+        quiet = not full_depth and (reduced or self._is_quiet(board))
+        position_key = self._position_key(board)
+        known = self._known_eval(board, quiet, position_key)
+        if known is not None:
+            return known
+        
+        evaluation = self._analyse_position(board, engine, quiet, stop_above, stop_beyond)
+        cp = evaluation[0]
+        if cp is not None and position_key is not None and (stop_above is None or cp <= stop_above) and \
+                (stop_beyond is None or abs(cp) <= stop_beyond):
+            # Scores past stop_above/stop_beyond may come from a truncated search, so they are not cached
+            store_eval((position_key, self._search_signature, quiet), evaluation)
+            if self.eval_db is not None:
+                self._save_stored_eval(position_key, quiet, evaluation)
+        return evaluation
+    
+    def _position_key(self, board: chess.Board) -> Optional[int]:
+        """
+        Cache key of a position (Iteration 13): its Zobrist hash, shared by the in-memory
+        cache and the SQLite tier.
+        The engine is sent the full move stack, so a position that repeats an earlier one,
+        or is close to the 50-move rule, can score differently from the same position
+        reached in another game; such positions get no key and are never cached.
+        
+        Args:
+            board: Chess board position (with its move stack)
+            
+        Returns:
+            Zobrist hash, or None if the evaluation depends on the move history
+        """
+        if board.halfmove_clock >= self.HISTORY_HALFMOVE_CLOCK or \
+                (board.halfmove_clock >= 4 and board.is_repetition(2)):
+            return None
+        return chess.polyglot.zobrist_hash(board)
+    
+    def _known_eval(self, board: chess.Board, quiet: bool,
+                    position_key: Optional[int]) -> Optional[Tuple[int, Optional[chess.Move]]]:
+        """
+        Evaluation available without any search (Iteration 13): game over, tablebase,
+        in-memory cache, then the SQLite tier.
+        
+        Args:
+            board: Chess board position
+            quiet: Whether the reduced budget was requested (a full-budget result also answers)
+            position_key: Key from _position_key (None: history-dependent, caches are skipped)
+            
+        Returns:
+            (centipawns from current player's perspective, best move or None), or None if unknown
+        """
+        # Iteration 13: Game-over positions are scored directly, no engine search
+        outcome = board.outcome()
+        if outcome is not None:
+            return (0 if outcome.winner is None else -self.MATE_SCORE), None  # Side to move is mated
+        
+        # Iteration 13: Endgames with few pieces are looked up instead of searched
+        tablebase_score = self._probe_tablebase(board)
+        if tablebase_score is not None:
+            return tablebase_score, None
+        
+        if position_key is None:
+            return None
+        
+        cache_key = (position_key, self._search_signature, quiet)
+        cached = get_cached_eval(cache_key)
+        if cached is None and quiet:
+            # A full-budget evaluation is at least as good as a reduced one
+            cached = get_cached_eval((position_key, self._search_signature, False))
+        if cached is not None:
+            return cached
+        
+        if self.eval_db is not None:
+            stored = self._load_stored_eval(position_key, quiet)
+            if stored is not None:
+                store_eval(cache_key, stored)
+                return stored
         return None
     
-    def _evaluate_position(self, board: chess.Board) -> Optional[int]:
+    def _load_stored_eval(self, position_key: int,
+                          quiet: bool) -> Optional[Tuple[int, Optional[chess.Move]]]:
+        """
+        Look up an evaluation in the persistent cache (Iteration 13).
+        A full-budget evaluation also answers a reduced-budget lookup.
+        
+        Args:
+            position_key: Zobrist hash of the position
+            quiet: Whether the reduced budget was requested
+            
+        Returns:
+            (centipawns, best move or None), or None if not stored
+        """
+        try:
+            row = self.eval_db.get(position_key, self._db_signature, quiet)
+            if row is None and quiet:
+                row = self.eval_db.get(position_key, self._db_signature, False)
+        except Exception as e:
+            logger.debug(f"Evaluation cache database lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        cp, best_move = row
+        return cp, (chess.Move.from_uci(best_move) if best_move else None)
+    
+    def _save_stored_eval(self, position_key: int, quiet: bool,
+                          evaluation: Tuple[int, Optional[chess.Move]]):
+        """Write an evaluation to the persistent cache (Iteration 13)."""
+        cp, best_move = evaluation
+        try:
+            self.eval_db.put(position_key, self._db_signature, quiet, cp,
+                             best_move.uci() if best_move else None)
+        except Exception as e:
+            logger.debug(f"Evaluation cache database write failed: {e}")
+    
+    def _evaluate_positions_batch(self, boards: List[chess.Board],
+                                  engine: Optional[chess.engine.SimpleEngine] = None,
+                                  full_depth: bool = False,
+                                  reduced: Optional[List[bool]] = None,
+                                  stop_above: Optional[List[Optional[int]]] = None,
+                                  stop_beyond: Optional[int] = None) -> List[Tuple[Optional[int], Optional[chess.Move]]]:
+        """
+        Evaluate several independent positions, in parallel when an engine pool is running.
+        Iteration 13: Each position checks an engine out of the pool only for its own
+        search, so every engine stays busy even when fewer games than engines remain.
+        
+        Args:
+            boards: Positions to evaluate
+            engine: Engine for serial evaluation when no pool is running
+            full_depth: Always use the full search budget
+            reduced: Per-board flags for the reduced (stage-adaptive) budget
+            stop_above: Per-board early-stop scores for post-move searches (None = search in full)
+            stop_beyond: Early-stop |score| for every board, e.g. SKIP_EVAL_THRESHOLD for pre-move searches
+            
+        Returns:
+            (evaluation, best move) pairs in the same order as `boards`
+        """
+        if reduced is None:
+            reduced = [False] * len(boards)
+        if stop_above is None:
+            stop_above = [None] * len(boards)
+        
+        # Iteration 13: Search each distinct position once per batch (repetitions and
+        # transpositions would otherwise race to the engines before the cache is filled)
+        # (history-dependent positions are never merged, see _position_key)
+        position_keys = [self._position_key(board) for board in boards]
+        keys = [(key if key is not None else ('history', i), r, stop)
+                for i, (key, r, stop) in enumerate(zip(position_keys, reduced, stop_above))]
+        unique = {}
+        for key, board in zip(keys, boards):
+            unique.setdefault(key, (board, key[1], key[2]))
+        # Iteration 13: Search the latest positions first; the deeper searches leave the
+        # engine hash primed for the earlier positions of the same game
+        order = list(unique)[::-1]
+        jobs = [unique[key] for key in order]
+        
+        if self._cloud_executor is not None and len(jobs) > 1:
+            self._prefetch_cloud_evals([board for board, _, _ in jobs])
+        
+        if self._engine_pool is None:
+            results = [self._evaluate_with_best_move(board, engine, full_depth, r, stop, stop_beyond)
+                       for board, r, stop in jobs]
+        elif len(jobs) < 2:
+            results = [self._evaluate_on_pool(board, full_depth, r, stop, stop_beyond)
+                       for board, r, stop in jobs]
+        else:
+            results = list(self._position_executor.map(
+                lambda job: self._evaluate_on_pool(job[0], full_depth, job[1], job[2], stop_beyond), jobs
+            ))
+        
+        by_key = dict(zip(order, results))
+        return [by_key[key] for key in keys]
+    
+    def _prefetch_cloud_evals(self, boards: List[chess.Board]):
+        """
+        Look up uncached positions in the Lichess Cloud concurrently (Iteration 13).
+        Hits are cached like any other evaluation, so the engine-side lookups find them
+        without checking an engine out; misses are remembered by the Lichess service and
+        go straight to Stockfish.
+        
+        Args:
+            boards: Distinct positions of a batch
+        """
+        # Same checks as _evaluate_with_best_move: only positions that would reach the
+        # cloud lookup there (any cached budget answers) are sent
+        # (history-dependent positions could not be cached, so they are left out)
+        pending = []
+        for board in boards:
+            position_key = self._position_key(board)
+            if position_key is not None and self._known_eval(board, True, position_key) is None:
+                pending.append((board, position_key))
+        if len(pending) < 2:
+            return
+        
+        fens = [self._cloud_fen(board) for board, _ in pending]
+        cloud_evals = self._cloud_executor.map(self.lichess_service.evaluate_position, fens)
+        for (board, position_key), cp in zip(pending, cloud_evals):
+            if cp is None:
+                continue
+            # Cloud evaluations are full-depth, so they also answer reduced-budget lookups
+            store_eval((position_key, self._search_signature, False), (cp, None))
+            if self.eval_db is not None:
+                self._save_stored_eval(position_key, False, (cp, None))
+    
+    def _evaluate_on_pool(self, board: chess.Board, full_depth: bool = False,
+                          reduced: bool = False,
+                          stop_above: Optional[int] = None,
+                          stop_beyond: Optional[int] = None) -> Tuple[Optional[int], Optional[chess.Move]]:
+        """Evaluate one position on an engine checked out of the pool (Iteration 13)."""
+        engine = self._engine_pool.get()
+        try:
+            return self._evaluate_with_best_move(board, engine, full_depth, reduced, stop_above, stop_beyond)
+        finally:
+            self._engine_pool.put(engine)
+    
+    def _is_decided_by_material(self, board: chess.Board) -> bool:
+        """
+        Check whether the material gap alone likely decides the game.
+        Iteration 13: Such positions are usually far beyond SKIP_EVAL_THRESHOLD, so their
+        pre-move search uses the reduced budget. The move is still only skipped once the
+        engine agrees (compensation or a mating attack can outweigh material). A smaller
+        gap counts in quiet positions, where it cannot be a half-finished exchange.
+        
+        Args:
+            board: Chess board position
+            
+        Returns:
+            True if one side is ahead by at least DECIDED_MATERIAL_THRESHOLD, or by
+            QUIET_DECIDED_MATERIAL_THRESHOLD in a quiet position
+        """
+        balance = 0
+        for piece_type, value in self.PIECE_VALUES.items():
+            balance += value * (chess.popcount(board.pieces_mask(piece_type, chess.WHITE)) -
+                                chess.popcount(board.pieces_mask(piece_type, chess.BLACK)))
+        gap = abs(balance)
+        if gap >= self.DECIDED_MATERIAL_THRESHOLD:
+            return True
+        return gap >= self.QUIET_DECIDED_MATERIAL_THRESHOLD and self._is_quiet(board)
+    
+    def _is_quiet(self, board: chess.Board) -> bool:
+        """
+        Check whether a position is quiet (side to move is not in check and has no captures).
+        
+        Args:
+            board: Chess board position
+            
+        Returns:
+            True if the position can be searched with the reduced budget
+        """
+        return not board.is_check() and next(board.generate_legal_captures(), None) is None
+    
+    @staticmethod
+    def _is_forced(board: chess.Board) -> bool:
+        """
+        Check whether the side to move has at most one legal move.
+        Iteration 13: With no alternative there is no CP loss to measure, so the move
+        needs no engine analysis.
+        
+        Args:
+            board: Position before the move
+            
+        Returns:
+            True if the move played was the only legal one
+        """
+        legal_moves = board.generate_legal_moves()
+        next(legal_moves, None)
+        return next(legal_moves, None) is None
+    
+    @staticmethod
+    def _cloud_fen(board: chess.Board) -> str:
+        """
+        FEN sent to the Lichess Cloud for a position.
+        Iteration 13: The cloud ignores the move counters, so they are normalized; the
+        same position reached at different move numbers is then one FEN (one request,
+        one remembered miss).
+        
+        Args:
+            board: Position to look up
+            
+        Returns:
+            FEN with halfmove clock 0 and fullmove number 1
+        """
+        return board.epd() + ' 0 1'
+    
+    def _search_limit(self, quiet: bool = False) -> chess.engine.Limit:
+        """
+        Build the Stockfish search limit for a position.
+        Iteration 13: Quiet positions get a smaller budget; tactical ones keep the full one.
+        
+        Args:
+            quiet: Whether the position is quiet
+            
+        Returns:
+            Search limit (nodes, time or depth+time)
+        """
+        # Iteration 12: Node-limited search for predictable timing (~0.05-0.1s per position)
+        if self.engine_nodes > 0:
+            # Node-limited search: 50K nodes = consistent ~0.1s timing
+            nodes = self.engine_nodes
+            if quiet:
+                nodes = max(1, nodes // self.QUIET_NODES_DIVISOR)
+            return chess.engine.Limit(nodes=nodes)
+        if self.use_lichess_cloud:
+            # Ultra-fast fallback when Lichess is primary: 100ms hard limit
+            return chess.engine.Limit(time=0.1)  # 100ms hard limit
+        # Traditional mode: use depth with time limit
+        if quiet:
+            return chess.engine.Limit(depth=min(self.engine_depth, self.QUIET_DEPTH),
+                                      time=min(self.time_limit, self.QUIET_TIME))
+        return chess.engine.Limit(depth=self.engine_depth, time=self.time_limit)
+    
+    def _analyse_position(self, board: chess.Board,
+                          engine: Optional[chess.engine.SimpleEngine] = None,
+                          quiet: bool = False,
+                          stop_above: Optional[int] = None,
+                          stop_beyond: Optional[int] = None) -> Tuple[Optional[int], Optional[chess.Move]]:
         """
         Evaluate position using Lichess Cloud API with Stockfish fallback.
         PRD v2.11 (Iteration 12): Added node-limited search for predictable timing on 1 vCPU.
         
         Args:
             board: Chess board position
+            engine: Stockfish engine to use (default: self.engine, Iteration 13)
+            quiet: Use the reduced search budget for quiet positions (Iteration 13)
+            stop_above: Early-stop score for the Stockfish search (Iteration 13)
+            stop_beyond: Early-stop |score| for the Stockfish search (Iteration 13)
             
         Returns:
-            Evaluation in centipawns (from current player's perspective), or None if error
+            (centipawns from current player's perspective or None if error,
+             Stockfish best move or None, Iteration 13)
         """
         # Step 1: Try Lichess Cloud API first (fast path: 0.01-0.05s)
         if self.use_lichess_cloud and self.lichess_service:
-            fen = board.fen()
+            fen = self._cloud_fen(board)
             lichess_eval = self.lichess_service.evaluate_position(fen)
             
             if lichess_eval is not None:
-                return lichess_eval  # Fast path succeeded
+                return lichess_eval, None  # Fast path succeeded
         
         # Step 2: Fallback to local Stockfish (slow path: 0.2-0.5s)
         # Keep existing Stockfish code as requested - do not remove
-        if not self.engine:
-            return None
+        engine = engine or self.engine
+        if not engine:
+            return None, None
             
         try:
-            # Iteration 12: Node-limited search for predictable timing (~0.05-0.1s per position)
-            if self.engine_nodes > 0:
-                # Node-limited search: 50K nodes = consistent ~0.1s timing
-                info = self.engine.analyse(
-                    board, 
-                    chess.engine.Limit(nodes=self.engine_nodes)
-                )
-            elif self.use_lichess_cloud:
-                # Ultra-fast fallback when Lichess is primary: 100ms hard limit
-                info = self.engine.analyse(
-                    board, 
-                    chess.engine.Limit(time=0.1)  # 100ms hard limit
-                )
-            else:
-                # Traditional mode: use depth with time limit
-                info = self.engine.analyse(
-                    board, 
-                    chess.engine.Limit(depth=self.engine_depth, time=self.time_limit)
-                )
+            info = self._search(engine, board, self._search_limit(quiet), stop_above, stop_beyond)
             
-            score = info.get('score')
-            if score:
-                # Get score relative to side to move
-                cp_score = score.relative.score(mate_score=10000)
-                return cp_score if cp_score is not None else 0
+            if 'score' in info:
+                # Get score relative to side to move (mates clamped to ±MATE_SCORE)
+                pv = info.get('pv')
+                return info['score'].relative.score(mate_score=self.MATE_SCORE), (pv[0] if pv else None)
         except Exception as e:
             logger.error(f"Engine analysis error: {e}")
         
-        return None
+        return None, None
+    
+    def _search(self, engine: chess.engine.SimpleEngine, board: chess.Board,
+                limit: chess.engine.Limit, stop_above: Optional[int] = None,
+                stop_beyond: Optional[int] = None) -> Dict:
+        """
+        Run a streaming engine search and return the latest search info.
+        Iteration 13: Consumes `info` lines as they arrive via engine.analysis() and
+        stops as soon as the requested depth is reported, instead of blocking in
+        engine.analyse() until `bestmove` and the trailing bookkeeping.
+        Iteration 13: Also stops once the score exceeds `stop_above` at
+        EARLY_STOP_MIN_DEPTH or deeper (the move is already a clear blunder), or once
+        |score| exceeds `stop_beyond` there (the position is already decided).
+        
+        Args:
+            engine: Stockfish engine to search with
+            board: Chess board position
+            limit: Search limit (nodes, depth and/or time)
+            stop_above: Score (side to move, mates as ±MATE_SCORE) that ends the search early
+            stop_beyond: Absolute score (same scale) that ends the search early
+            
+        Returns:
+            Latest info dictionary that carried a score (empty if none)
+        """
+        latest = {}
+        # Iteration 13: Score + PV only (the PV's first move is the best move);
+        # currmove/refutation/string fields are not parsed
+        with engine.analysis(board, limit, info=chess.engine.INFO_SCORE | chess.engine.INFO_PV) as analysis:
+            for info in analysis:
+                if 'score' not in info:
+                    continue
+                latest = info
+                depth = info.get('depth', 0)
+                if limit.depth and depth >= limit.depth:
+                    break  # Requested depth reached, leaving the context stops the search
+                if depth < self.EARLY_STOP_MIN_DEPTH:
+                    continue
+                cp = info['score'].relative.score(mate_score=self.MATE_SCORE)
+                if stop_above is not None and cp > stop_above:
+                    break  # Clear blunder, a deeper search would not change its class
+                if stop_beyond is not None and abs(cp) > stop_beyond:
+                    break  # Decided position, it is skipped whatever the exact score
+        return latest
     
-    def _select_moves_to_analyze(self, total_player_moves: int) -> set:
+    def _select_moves_to_analyze(self, total_player_moves: int, resigned_loss: bool = False) -> bytearray:
         """
         Select which move indices to analyze using strategic sampling.
         PRD v2.11 (Iteration 12): 5 early + 5 middle + 5 endgame = 15 moves per game.
         Redistributes unused moves when game is too short.
+        Iteration 13: In critical-only runs, resignation losses sample only their last
+        RESIGNED_TAIL_MOVES moves.
         
         Args:
             total_player_moves: Total number of player moves in the game
+            resigned_loss: Sample only the final moves (resignation loss, critical-only run)
             
         Returns:
-            Set of move indices (0-based) to analyze
+            Byte-per-move mask (Iteration 13), 1 at the 0-based indices to analyze
         """
-        moves_to_analyze = set()
+        if resigned_loss:
+            tail = min(self.RESIGNED_TAIL_MOVES, self.moves_per_game, total_player_moves)
+            return bytearray(total_player_moves - tail) + bytearray(b'\x01') * tail
         
         # If game has <= 15 moves, analyze all
         if total_player_moves <= self.moves_per_game:
-            return set(range(total_player_moves))
+            return bytearray(b'\x01') * total_player_moves
+        
+        # Iteration 13: Selections are marked in one byte-per-move mask instead of
+        # per-stage sets that are unioned and diffed
+        selected = bytearray(total_player_moves)
         
         # Calculate stage boundaries (early: 0-33%, middle: 33-66%, end: 66-100%)
         early_end = total_player_moves // 3
@@ -207,46 +1127,42 @@ class MistakeAnalysisService:
         
         # Early game: First 5 moves (or all if less than 5)
         early_moves = min(self.MOVES_PER_STAGE, early_end)
-        early_selected = set(range(early_moves))
+        selected[:early_moves] = b'\x01' * early_moves
         
         # Endgame: Last 5 moves (or all if less than 5 remaining)
         endgame_moves = min(self.MOVES_PER_STAGE, total_player_moves - middle_end)
-        endgame_selected = set(range(total_player_moves - endgame_moves, total_player_moves))
+        selected[total_player_moves - endgame_moves:] = b'\x01' * endgame_moves
         
         # Middle game: Sample 5 moves evenly from middle section
         middle_range = middle_end - early_end
         middle_moves = min(self.MOVES_PER_STAGE, middle_range)
-        middle_selected = set()
         
         if middle_moves > 0 and middle_range > 0:
             step = middle_range / middle_moves
             for i in range(middle_moves):
-                move_idx = early_end + int(i * step)
-                middle_selected.add(move_idx)
-        
-        # Combine all selections
-        moves_to_analyze.update(early_selected)
-        moves_to_analyze.update(middle_selected)
-        moves_to_analyze.update(endgame_selected)
+                selected[early_end + int(i * step)] = 1
         
         # Redistribution: If we have fewer than 15 moves, fill from under-sampled stages
-        if len(moves_to_analyze) < self.moves_per_game:
-            remaining_slots = self.moves_per_game - len(moves_to_analyze)
+        selected_count = selected.count(1)
+        if selected_count < self.moves_per_game:
+            remaining_slots = self.moves_per_game - selected_count
             
-            # Find moves not yet selected
-            all_moves = set(range(total_player_moves))
-            unselected = all_moves - moves_to_analyze
+            # Find moves not yet selected (in move order)
+            unselected_list = [i for i, flag in enumerate(selected) if not flag]
             
             # Add evenly from unselected moves
-            if unselected:
-                unselected_list = sorted(unselected)
-                step = len(unselected_list) / min(remaining_slots, len(unselected_list))
-                for i in range(min(remaining_slots, len(unselected_list))):
-                    moves_to_analyze.add(unselected_list[int(i * step)])
+            if unselected_list:
+                picks = min(remaining_slots, len(unselected_list))
+                step = len(unselected_list) / picks
+                for i in range(picks):
+                    selected[unselected_list[int(i * step)]] = 1
         
-        return moves_to_analyze
+        return selected
     
-    def analyze_game_mistakes(self, pgn_string: str, player_color: str) -> Dict:
+    def analyze_game_mistakes(self, pgn_string: str, player_color: str,
+                              engine: Optional[chess.engine.SimpleEngine] = None,
+                              resigned_loss: bool = False,
+                              parsed: Optional[Tuple[chess.Board, List[chess.Move]]] = None) -> Dict:
         """
         Analyze a single game for move quality across all stages.
         PRD v2.5: Tracks brilliant/neutral/mistake moves (simplified classification).
@@ -255,176 +1171,211 @@ class MistakeAnalysisService:
         Args:
             pgn_string: PGN string of the game
             player_color: 'white' or 'black' - which side to analyze
+            engine: Stockfish engine to use (default: self.engine, Iteration 13)
+            resigned_loss: Sample only the final moves (resignation loss in a critical-only run, Iteration 13)
+            parsed: (starting board, mainline moves) already parsed from pgn_string (Iteration 13)
             
         Returns:
             Dictionary with move quality analysis per stage
         """
-        mistakes = {
-            'early': {
-                'total_moves': 0,
-                'inaccuracies': 0,  # Kept for backward compatibility
-                'mistakes': 0,  # Kept for backward compatibility
-                'blunders': 0,  # Kept for backward compatibility
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_mistake': None,
-                # v2.5: New move quality tracking
-                'brilliant_moves': 0,  # ≥+100 CP gain
-                'neutral_moves': 0,  # -49 to +99 CP
-                'mistake_moves': 0  # ≤-50 CP loss
-            },
-            'middle': {
-                'total_moves': 0,
-                'inaccuracies': 0,
-                'mistakes': 0,
-                'blunders': 0,
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_mistake': None,
-                'brilliant_moves': 0,
-                'neutral_moves': 0,
-                'mistake_moves': 0
-            },
-            'endgame': {
-                'total_moves': 0,
-                'inaccuracies': 0,
-                'mistakes': 0,
-                'blunders': 0,
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_mistake': None,
-                'brilliant_moves': 0,
-                'neutral_moves': 0,
-                'mistake_moves': 0
-            }
-        }
+        # Iteration 13: Slotted per-stage stats, converted to dicts on return
+        mistakes = new_game_stats()
         
-        if not self.enabled or not self.engine:
-            return mistakes
+        engine = engine or self.engine
+        if not self.enabled or not engine:
+            return game_stats_to_dict(mistakes)
         
+        mistake_log = []  # Iteration 13: (stage, move_number, cp_loss), classified in one pass
         try:
-            # Parse PGN
-            game = chess.pgn.read_game(StringIO(pgn_string))
-            if not game:
-                return mistakes
+            # Parse PGN (Iteration 13: mainline moves only, no game tree or tokenizer)
+            if parsed is None:
+                parsed = parse_mainline(pgn_string)
+            if not parsed:
+                return game_stats_to_dict(mistakes)
+            start_board, moves = parsed
             
-            board = game.board()
             player_is_white = (player_color.lower() == 'white')
+            player_turn = chess.WHITE if player_is_white else chess.BLACK
             
-            # First pass: Count total player moves
-            total_player_moves = 0
-            for move in game.mainline_moves():
-                is_player_move = (board.turn == chess.WHITE and player_is_white) or \
-                                 (board.turn == chess.BLACK and not player_is_white)
-                if is_player_move:
-                    total_player_moves += 1
-                board.push(move)
+            # Count total player moves (Iteration 13: sides alternate, so no replay needed)
+            player_moves_first = start_board.turn == player_turn
+            if player_moves_first:
+                total_player_moves = (len(moves) + 1) // 2
+            else:
+                total_player_moves = len(moves) // 2
+            # Iteration 13: Player's plies by parity (odd if they make the first move)
+            player_parity = 1 if player_moves_first else 0
             
             # Determine which moves to analyze
-            moves_to_analyze = self._select_moves_to_analyze(total_player_moves)
+            # (Iteration 13: as a byte-per-move bitmap, indexed instead of hashed per ply)
+            moves_to_analyze = self._select_moves_to_analyze(total_player_moves, resigned_loss)
             
-            # Second pass: Analyze selected moves
-            board = game.board()
+            # Walk the game once, collecting positions around the selected moves
+            board = start_board.copy()
             move_number = 0
             ply = 0  # Half-moves (increments every move)
             player_move_index = 0  # Track player move index (0-based)
             
-            for move in game.mainline_moves():
+            # Iteration 13: Stage table, stage dicts and hot methods bound to locals
+            stage_by_move = self.STAGE_BY_MOVE
+            stage_limit = len(stage_by_move)
+            early = mistakes['early']
+            endgame = mistakes['endgame']
+            is_book_move = self._is_book_move
+            is_forced = self._is_forced
+            push = board.push
+            
+            # Iteration 13: (stage, stage_data, move_number, board before, move); the
+            # position after the move is only built for moves that need a post-move search
+            candidates = []
+            pending = moves_to_analyze.count(1)  # Selected moves not reached yet
+            
+            for move in moves:
                 ply += 1
                 
-                # Calculate full move number (increments after Black's move)
-                move_number = (ply + 1) // 2
-                
-                # Determine game stage
-                stage = self._get_stage(move_number)
-                
                 # Check if it's the player's move
-                is_player_move = (board.turn == chess.WHITE and player_is_white) or \
-                                 (board.turn == chess.BLACK and not player_is_white)
-                
-                if is_player_move:
-                    mistakes[stage]['total_moves'] += 1
+                if ply & 1 == player_parity:
+                    # Calculate full move number (increments after Black's move)
+                    move_number = (ply + 1) // 2
                     
-                    # Check if this move should be analyzed
-                    should_analyze = player_move_index in moves_to_analyze
+                    # Determine game stage (table lookup, same as _get_stage)
+                    if move_number < stage_limit:
+                        stage = stage_by_move[move_number]
+                        stage_data = mistakes[stage]
+                    else:
+                        stage, stage_data = 'endgame', endgame
                     
-                    if should_analyze:
-                        # Get evaluation before move
-                        current_eval = self._evaluate_position(board)
-                        
-                        # PRD v2.3: Skip analyzing heavily winning/losing positions (>600 CP)
-                        if current_eval is not None and abs(current_eval) > self.SKIP_EVAL_THRESHOLD:
-                            board.push(move)
-                            player_move_index += 1
-                            continue  # Skip analysis, game already heavily decided
-                        
-                        # Make the move
-                        board.push(move)
-                        
-                        # Get evaluation after move (from opponent's perspective, so negate)
-                        new_eval_opponent = self._evaluate_position(board)
-                        new_eval = -new_eval_opponent if new_eval_opponent is not None else None
+                    stage_data.total_moves += 1
                     
-                        # Calculate centipawn change (positive = gain, negative = loss)
-                        if current_eval is not None and new_eval is not None:
-                            cp_change = new_eval - current_eval  # Positive if position improved
-                            cp_loss = current_eval - new_eval  # Positive if position worsened
-                            
-                            # PRD v2.5: Classify move quality
-                            if cp_change >= 100:
-                                # Brilliant move: ≥+100 CP gain
-                                mistakes[stage]['brilliant_moves'] += 1
-                            elif cp_loss >= 50:
-                                # Mistake move: ≥-50 CP loss
-                                mistakes[stage]['mistake_moves'] += 1
-                                
-                                # Also update old tracking for backward compatibility
-                                mistake_type = self._classify_mistake(cp_loss)
-                                if mistake_type == 'inaccuracy':
-                                    mistakes[stage]['inaccuracies'] += 1
-                                elif mistake_type == 'mistake':
-                                    mistakes[stage]['mistakes'] += 1
-                                elif mistake_type == 'blunder':
-                                    mistakes[stage]['blunders'] += 1
-                                
-                                mistakes[stage]['cp_losses'].append(cp_loss)
-                                
-                                # Track worst mistake
-                                if mistakes[stage]['worst_mistake'] is None or \
-                                   cp_loss > mistakes[stage]['worst_mistake']['cp_loss']:
-                                    mistakes[stage]['worst_mistake'] = {
-                                        'move_number': move_number,
-                                        'cp_loss': cp_loss,
-                                        'type': mistake_type or 'mistake'
-                                    }
-                            else:
-                                # Neutral move: -49 to +99 CP
-                                mistakes[stage]['neutral_moves'] += 1
-                    else:
-                        # Move not selected for analysis, just push it
-                        board.push(move)
+                    # Check if this move should be analyzed
+                    if moves_to_analyze[player_move_index]:
+                        pending -= 1
+                        # Iteration 13: Early-game book moves are neutral, skip both engine calls
+                        if stage_data is early and is_book_move(board, move):
+                            stage_data.neutral_moves += 1
+                        # Iteration 13: The only legal move is neutral by definition
+                        elif is_forced(board):
+                            stage_data.neutral_moves += 1
+                        else:
+                            # The copy keeps the move stack, so the engine is sent
+                            # `position startpos moves ...` and never a bare FEN
+                            candidates.append((stage, stage_data, move_number, board.copy(), move))
                     
                     player_move_index += 1
+                
+                # Iteration 13: Past the last selected move only the counters need updating
+                if pending:
+                    push(move)
+            
+            # Iteration 13: Evaluate in waves so positions are searched in parallel
+            # across the engine pool (serially on `engine` when no pool is running)
+            evaluate_batch = self._evaluate_positions_batch
+            skip_threshold = self.SKIP_EVAL_THRESHOLD
+            
+            # Iteration 13: Opening positions are searched with the reduced budget
+            # (book-like moves rarely cross the inaccuracy threshold), and so are positions
+            # the material gap likely decides; the >600 CP skip below still needs the engine
+            reduced_stages = self.REDUCED_BUDGET_STAGES
+            is_decided = self._is_decided_by_material
+            reduced = [c[0] in reduced_stages or is_decided(c[3]) for c in candidates]
+            
+            # Wave 1: Evaluation (and engine best move) before each move
+            # Iteration 13: A search stops early once the position passes SKIP_EVAL_THRESHOLD
+            pre_results = evaluate_batch([c[3] for c in candidates], engine, False, reduced,
+                                         None, skip_threshold)
+            current_evals = [cp for cp, _ in pre_results]
+            
+            # PRD v2.3: Skip analyzing heavily winning/losing positions (>600 CP)
+            to_follow = [i for i, current_eval in enumerate(current_evals)
+                         if current_eval is not None and abs(current_eval) <= skip_threshold]
+            
+            # Iteration 13: Playing the engine's best move keeps the evaluation,
+            # so only other moves need a post-move search
+            new_evals = [None] * len(candidates)
+            to_search = []
+            for i in to_follow:
+                best_move = pre_results[i][1]
+                if best_move is not None and candidates[i][4] == best_move:
+                    new_evals[i] = current_evals[i]
+                else:
+                    to_search.append(i)
+            
+            after_boards = {}
+            for i in to_search:
+                after = candidates[i][3].copy()
+                after.push(candidates[i][4])
+                after_boards[i] = after
+            
+            # Wave 2: Evaluation after the move (from opponent's perspective, so negate).
+            # Iteration 13: A search stops early once the loss exceeds EARLY_STOP_THRESHOLD
+            early_stop = self.EARLY_STOP_THRESHOLD
+            post_results = evaluate_batch([after_boards[i] for i in to_search], engine, False,
+                                          [reduced[i] for i in to_search],
+                                          [early_stop - current_evals[i] for i in to_search])
+            for i, (opponent_eval, _) in zip(to_search, post_results):
+                new_evals[i] = -opponent_eval if opponent_eval is not None else None
+            
+            # Wave 3: Confirm reduced-budget mistakes with full-depth searches
+            # (cache hits for tactical positions, which were searched in full). A mistake
+            # is never the engine's best move, so its post-move board was built above
+            # Losses past EARLY_STOP_THRESHOLD are blunders at any depth and are not re-searched
+            to_confirm = [i for i in to_follow
+                          if new_evals[i] is not None and 50 <= current_evals[i] - new_evals[i] <= early_stop]
+            confirm_boards = [candidates[i][3] for i in to_confirm] + [after_boards[i] for i in to_confirm]
+            confirmed = [cp for cp, _ in evaluate_batch(confirm_boards, engine, True)]
+            for n, i in enumerate(to_confirm):
+                confirmed_eval, confirmed_opponent = confirmed[n], confirmed[n + len(to_confirm)]
+                if confirmed_eval is not None and confirmed_opponent is not None:
+                    current_evals[i] = confirmed_eval
+                    new_evals[i] = -confirmed_opponent
+            
+            # Classify move quality in move order
+            log_mistake = mistake_log.append
+            for i in to_follow:
+                stage, stage_data, move_number = candidates[i][:3]
+                current_eval, new_eval = current_evals[i], new_evals[i]
+                if new_eval is None:
+                    continue
+                
+                # Calculate centipawn change (positive = gain, negative = loss)
+                cp_change = new_eval - current_eval  # Positive if position improved
+                cp_loss = current_eval - new_eval  # Positive if position worsened
+                
+                # PRD v2.5: Classify move quality
+                if cp_change >= 100:
+                    # Brilliant move: ≥+100 CP gain
+                    stage_data.brilliant_moves += 1
+                elif cp_loss >= 50:
+                    # Mistake move: ≥-50 CP loss (classified after the loop)
+                    stage_data.mistake_moves += 1
+                    log_mistake((stage, move_number, cp_loss))
                 else:
-                    # Opponent's move
-                    board.push(move)
+                    # Neutral move: -49 to +99 CP
+                    stage_data.neutral_moves += 1
             
-            return mistakes
+            self._classify_logged_mistakes(mistakes, mistake_log)
+            return game_stats_to_dict(mistakes)
             
         except Exception as e:
             logger.error(f"Error analyzing game: {e}")
-            return mistakes
+            self._classify_logged_mistakes(mistakes, mistake_log)
+            return game_stats_to_dict(mistakes)
     
-    def aggregate_mistake_analysis(self, games_data: List[Dict], username: str, progress_callback=None) -> Dict:
+    def aggregate_mistake_analysis(self, games_data: Iterable[Dict], username: str, progress_callback=None,
+                                   critical_only: Optional[bool] = None) -> Dict:
         """
         Aggregate mistake analysis across all games.
         PRD v2.2: Analyzes exactly 2 games (evenly distributed across time period) for 1-minute performance target.
         PRD v2.1: Critical mistake links now only show games player lost by resignation.
+        Iteration 13: Also accepts a one-shot iterable (e.g. a generator over an archive).
         
         Args:
-            games_data: List of game dictionaries with 'pgn', player info, and game result
+            games_data: Game dictionaries with 'pgn', player info, and game result (list or iterable)
             username: Player's username to determine color
             progress_callback: Optional callback function(current, total) to report progress
+            critical_only: Only search games that can be a critical mistake game (lost by
+                resignation); the others just count their moves and are left out of the
+                per-game averages (default: self.critical_only, Iteration 13)
             
         Returns:
             Aggregated mistake analysis with statistics per stage
@@ -432,147 +1383,122 @@ class MistakeAnalysisService:
         if not self.enabled:
             return self._empty_aggregation()
         
-        # Start engine
-        self.engine = self._start_engine()
-        if not self.engine:
-            logger.warning("Engine not available, skipping mistake analysis")
-            return self._empty_aggregation()
-        
-        aggregated = {
-            'early': {
-                'total_moves': 0,
-                'inaccuracies': 0,
-                'mistakes': 0,
-                'blunders': 0,
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_game': None,
-                'avg_cp_loss': 0,
-                'critical_mistake_game': None,  # PRD v2.1: Separate field for critical games
-                # v2.5: New move quality tracking
-                'brilliant_moves': 0,
-                'neutral_moves': 0,
-                'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0,
-                'avg_neutral_per_game': 0.0,
-                'avg_mistakes_per_game': 0.0
-            },
-            'middle': {
-                'total_moves': 0,
-                'inaccuracies': 0,
-                'mistakes': 0,
-                'blunders': 0,
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_game': None,
-                'avg_cp_loss': 0,
-                'critical_mistake_game': None,
-                'brilliant_moves': 0,
-                'neutral_moves': 0,
-                'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0,
-                'avg_neutral_per_game': 0.0,
-                'avg_mistakes_per_game': 0.0
-            },
-            'endgame': {
-                'total_moves': 0,
-                'inaccuracies': 0,
-                'mistakes': 0,
-                'blunders': 0,
-                'missed_opps': 0,
-                'cp_losses': [],
-                'worst_game': None,
-                'avg_cp_loss': 0,
-                'critical_mistake_game': None,
-                'brilliant_moves': 0,
-                'neutral_moves': 0,
-                'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0,
-                'avg_neutral_per_game': 0.0,
-                'avg_mistakes_per_game': 0.0
-            },
-            'sample_info': {
-                'total_games': len(games_data),
-                'analyzed_games': 0,
-                'sample_percentage': 0
-            }
-        }
+        aggregated = self._empty_aggregation()
         
         username_lower = username.lower()
         
+        if isinstance(games_data, Sized):
+            total_count = len(games_data)
+            # Iteration 13: Drop bullet/very short games (fall back to all if none qualify)
+            candidate_games = [g for g in games_data if self._game_worth_analyzing(g)] or games_data
+        else:
+            # Iteration 13: Streamed games are thinned in one pass, never held all at once
+            candidate_games, total_count = self._sample_game_stream(games_data)
+        aggregated['sample_info']['total_games'] = total_count
+        
         # Iteration 12: Simplified game selection logic
         # Always cap at max_analysis_games (default 10) for consistent performance
-        total_games = len(games_data)
+        total_games = len(candidate_games)
         if total_games <= self.max_analysis_games:
-            games_to_analyze = games_data  # Analyze all if under limit
+            games_to_analyze = candidate_games  # Analyze all if under limit
         else:
             # Select evenly distributed games up to max limit
-            games_to_analyze = self._select_games_for_analysis(games_data, max_games=self.max_analysis_games)
+            games_to_analyze = self._select_games_for_analysis(candidate_games, max_games=self.max_analysis_games)
         
         aggregated['sample_info']['analyzed_games'] = len(games_to_analyze)
-        if len(games_data) > 0:
+        if total_count > 0:
             aggregated['sample_info']['sample_percentage'] = round(
-                (len(games_to_analyze) / len(games_data)) * 100, 1
+                (len(games_to_analyze) / total_count) * 100, 1
             )
         
-        logger.info(f"Iteration 12: Analyzing {len(games_to_analyze)} games out of {len(games_data)} total games ({aggregated['sample_info']['sample_percentage']}% sample)")
+        logger.info(f"Iteration 12: Analyzing {len(games_to_analyze)} games out of {total_count} total games ({aggregated['sample_info']['sample_percentage']}% sample)")
+        
+        # Collect per-game jobs (player color, result, termination)
+        jobs = []
+        for idx, game_data in enumerate(games_to_analyze):
+            # Determine player color (Iteration 13: only White's name needs lowercasing)
+            white = game_data.get('white', {})
+            player_color = 'white' if white.get('username', '').lower() == username_lower else 'black'
+            
+            # Get game result information (from the player's side, looked up once)
+            side = white if player_color == 'white' else game_data.get('black', {})
+            player_result = side.get('result', '')
+            termination = side.get('termination', '')
+            
+            pgn = game_data.get('pgn', '')
+            if not pgn:
+                logger.warning(f"Game {idx} missing PGN, skipping")
+                continue
+            
+            # Iteration 13: Parsed once here, so unreadable games are dropped before
+            # Stockfish starts and workers only replay the move list
+            try:
+                parsed = parse_mainline(pgn)
+            except Exception as e:
+                logger.warning(f"Game {idx} PGN could not be parsed, skipping: {e}")
+                continue
+            if not parsed:
+                logger.warning(f"Game {idx} PGN contains no game, skipping")
+                continue
+            
+            jobs.append((idx, game_data, player_color, player_result, termination, pgn, parsed))
+        
+        # Iteration 13: Nothing to search (no games or no readable PGNs), so never spawn Stockfish
+        if not jobs:
+            logger.info("No games with a PGN to analyze, skipping engine startup")
+            return aggregated
+        
+        # Iteration 13: With critical_only, games that cannot be critical skip the engine
+        if critical_only is None:
+            critical_only = self.critical_only
+        engine_jobs = jobs
+        count_only_jobs = []
+        if critical_only:
+            engine_jobs = []
+            for job in jobs:
+                (engine_jobs if self._is_resignation_loss(job[3], job[4]) else count_only_jobs).append(job)
+        
+        # Start engine (Iteration 13: reuse an engine started by warmup()/`with`)
+        owns_engine = self.engine is None and bool(engine_jobs)
+        if owns_engine:
+            self._pool_size = self._resolve_worker_count(len(engine_jobs))
+            self.engine = self._start_engine()
+        if engine_jobs and not self.engine:
+            logger.warning("Engine not available, skipping mistake analysis")
+            return self._empty_aggregation()
         
         try:
-            # Analyze selected games
-            for idx, game_data in enumerate(games_to_analyze):
-                # Determine player color
-                white_username = game_data.get('white', {}).get('username', '').lower()
-                black_username = game_data.get('black', {}).get('username', '').lower()
-                player_color = 'white' if white_username == username_lower else 'black'
-                
-                # Get game result information
-                player_result = None
-                termination = None
-                
-                if player_color == 'white':
-                    player_result = game_data.get('white', {}).get('result', '')
-                    termination = game_data.get('white', {}).get('termination', '')
-                else:
-                    player_result = game_data.get('black', {}).get('result', '')
-                    termination = game_data.get('black', {}).get('termination', '')
-                
-                pgn = game_data.get('pgn', '')
-                if not pgn:
-                    logger.warning(f"Game {idx} missing PGN, skipping")
-                    continue
-                
-                # Analyze game
-                try:
-                    game_mistakes = self.analyze_game_mistakes(pgn, player_color)
-                except Exception as e:
-                    logger.error(f"Error analyzing game {idx}: {e}")
+            # Iteration 13: Analyze games in parallel (one Stockfish process per worker)
+            game_results = self._analyze_games_parallel(engine_jobs, len(games_to_analyze) - len(count_only_jobs),
+                                                        progress_callback, critical_only)
+            for idx, _, player_color, _, _, _, parsed in count_only_jobs:
+                game_results[idx] = self._count_player_moves(parsed, player_color)
+            
+            # Iteration 13: Summed counters are kept per field as [early, middle, endgame]
+            # columns and written into the aggregated dicts once, after the game loop
+            totals = {name: [0] * len(STAGES) for name in AGGREGATE_COUNTERS}
+            # Individual losses are only kept locally for the 75th-percentile threshold
+            stage_cp_losses = [[] for _ in STAGES]
+            
+            # Aggregate in original game order so tie-breaks stay deterministic
+            for idx, game_data, player_color, player_result, termination, pgn, parsed in jobs:
+                game_mistakes = game_results.get(idx)
+                if game_mistakes is None:
                     continue
                 
                 # Check if game qualifies for critical mistake link (PRD v2.1 criteria)
                 # Must meet ALL: player lost + resignation termination + significant CP drop
-                # Loss values from Chess.com: 'checkmated', 'timeout', 'resigned', 'abandoned', 'lose'
-                is_loss = player_result in ['checkmated', 'timeout', 'resigned', 'abandoned', 'lose']
-                is_qualifying_game = (
-                    is_loss and 
-                    (('resign' in termination.lower()) if termination else False)
-                )
+                is_qualifying_game = self._is_resignation_loss(player_result, termination)
                 
                 # Aggregate results
-                for stage in ['early', 'middle', 'endgame']:
+                for stage_index, stage in enumerate(STAGES):
                     stage_data = game_mistakes[stage]
                     agg_stage = aggregated[stage]
                     
-                    agg_stage['total_moves'] += stage_data['total_moves']
-                    agg_stage['inaccuracies'] += stage_data['inaccuracies']
-                    agg_stage['mistakes'] += stage_data['mistakes']
-                    agg_stage['blunders'] += stage_data['blunders']
-                    agg_stage['missed_opps'] += stage_data['missed_opps']
-                    agg_stage['cp_losses'].extend(stage_data['cp_losses'])
-                    
-                    # v2.5: Aggregate new move quality metrics
-                    agg_stage['brilliant_moves'] += stage_data.get('brilliant_moves', 0)
-                    agg_stage['neutral_moves'] += stage_data.get('neutral_moves', 0)
-                    agg_stage['mistake_moves'] += stage_data.get('mistake_moves', 0)
+                    # Counters, including v2.5 move quality metrics
+                    for name, column in totals.items():
+                        column[stage_index] += stage_data[name]
+                    stage_cp_losses[stage_index] += stage_data['cp_losses']
                     
                     # Track worst game for this stage (general tracking)
                     worst_mistake = stage_data.get('worst_mistake')
@@ -609,27 +1535,21 @@ class MistakeAnalysisService:
                                 'result': player_result,
                                 'termination': termination
                             }
-                
-                # Log progress every 10 games
-                if (idx + 1) % 10 == 0:
-                    logger.info(f"Analyzed {idx + 1}/{len(games_to_analyze)} games")
-                
-                # Report progress to callback if provided
-                if progress_callback:
-                    progress_callback(idx + 1, len(games_to_analyze))
             
             # Calculate averages and apply significance threshold for critical mistakes
-            analyzed_games_count = len(games_to_analyze)
-            for stage in ['early', 'middle', 'endgame']:
-                cp_losses = aggregated[stage]['cp_losses']
-                if cp_losses:
-                    aggregated[stage]['avg_cp_loss'] = round(sum(cp_losses) / len(cp_losses), 1)
+            # Iteration 13: Count-only games add no move-quality data to average over
+            analyzed_games_count = len(games_to_analyze) - len(count_only_jobs)
+            for stage_index, stage in enumerate(STAGES):
+                for name, column in totals.items():
+                    aggregated[stage][name] = column[stage_index]
+                cp_losses = stage_cp_losses[stage_index]
+                cp_loss_count = aggregated[stage]['cp_loss_count']
+                if cp_loss_count:
+                    aggregated[stage]['avg_cp_loss'] = round(aggregated[stage]['cp_loss_sum'] / cp_loss_count, 1)
                     
                     # Calculate significance threshold (PRD v2.1: data-driven threshold)
                     # Use 75th percentile or 300 CP, whichever is higher
-                    sorted_losses = sorted(cp_losses)
-                    percentile_75_idx = int(len(sorted_losses) * 0.75)
-                    threshold = max(sorted_losses[percentile_75_idx] if percentile_75_idx < len(sorted_losses) else 300, 300)
+                    threshold = max(self._percentile_75(cp_losses), 300)
                     
                     # Filter critical mistake if below threshold
                     critical_game = aggregated[stage]['critical_mistake_game']
@@ -651,7 +1571,7 @@ class MistakeAnalysisService:
                         aggregated[stage]['mistake_moves'] / analyzed_games_count, 1
                     )
             
-            logger.info(f"Mistake analysis complete: {len(games_data)} games analyzed")
+            logger.info(f"Mistake analysis complete: {total_count} games analyzed")
             
             # Log Lichess API statistics (Iteration 11)
             if self.use_lichess_cloud and self.lichess_service:
@@ -662,11 +1582,217 @@ class MistakeAnalysisService:
         except Exception as e:
             logger.error(f"Error in aggregate analysis: {e}")
         finally:
-            # Always stop engine
-            self._stop_engine()
+            # Stop the engine unless its lifetime is owned by warmup()/`with`
+            if owns_engine:
+                self._stop_engine()
         
         return aggregated
     
+    def aggregate_mistake_analysis_from_archive(self, archive_path: str, username: str,
+                                                progress_callback=None) -> Dict:
+        """
+        Aggregate mistake analysis for games stored in a concatenated PGN archive file.
+        Iteration 13: Games are sliced from a memory-mapped archive by byte offsets and
+        only their headers are read up front; moves are parsed only for sampled games.
+        Records are streamed, so only the running sample is kept in memory.
+        
+        Args:
+            archive_path: Path to a .pgn file containing one or more games
+            username: Player's username to determine color
+            progress_callback: Optional callback function(current, total) to report progress
+            
+        Returns:
+            Aggregated mistake analysis with statistics per stage
+        """
+        games_data = (archive_game_record(pgn) for pgn in iter_archive_pgns(archive_path))
+        return self.aggregate_mistake_analysis(games_data, username, progress_callback)
+    
+    @staticmethod
+    def _percentile_75(cp_losses: List[int]) -> int:
+        """
+        75th-percentile CP loss (value at index int(n * 0.75) of the sorted losses).
+        Iteration 13: Partial selection of the top quarter with heapq instead of sorting
+        every loss.
+        
+        Args:
+            cp_losses: Non-empty list of CP losses
+            
+        Returns:
+            75th-percentile CP loss
+        """
+        rank_from_top = len(cp_losses) - int(len(cp_losses) * 0.75)
+        return heapq.nlargest(rank_from_top, cp_losses)[-1]
+    
+    def _analyze_games_parallel(self, jobs: List[Tuple], total_games: int,
+                                progress_callback=None, tail_resignations: bool = False) -> Dict[int, Dict]:
+        """
+        Analyze games concurrently across a pool of Stockfish processes.
+        Iteration 13: Games are walked concurrently and their positions are searched on
+        whichever engine is idle; the cores are split across the pool, so they stay busy
+        even when fewer games than cores are analyzed.
+        
+        Args:
+            jobs: List of (idx, game_data, player_color, player_result, termination, pgn, parsed) tuples
+            total_games: Number of games selected for analysis (for progress reporting)
+            progress_callback: Optional callback function(current, total) to report progress
+            tail_resignations: Sample only the final moves of resignation losses (critical-only
+                runs; the stage statistics need the full 5/5/5 sample otherwise)
+            
+        Returns:
+            Dictionary mapping game index to its per-stage mistake analysis
+        """
+        results = {}
+        if not jobs:
+            return results
+        
+        self._start_engine_pool(self._resolve_worker_count(len(jobs)))
+        workers = len(self._engines)
+        self._fit_pool_threads(workers)
+        # Iteration 13: LIFO hand-out keeps reusing the most recently used engine, whose
+        # hash table still holds the neighbouring positions of the game it just searched
+        self._engine_pool = queue.LifoQueue()
+        for engine in self._engines:
+            self._engine_pool.put(engine)
+        self._position_executor = ThreadPoolExecutor(max_workers=workers)
+        if self.use_lichess_cloud and self.lichess_service:
+            self._cloud_executor = ThreadPoolExecutor(max_workers=self.CLOUD_LOOKUP_WORKERS)
+        
+        logger.info(f"Analyzing {len(jobs)} games with {workers} engine worker(s)")
+        
+        try:
+            # Game threads only walk PGNs and wait on position searches; engines are
+            # checked out per position by the position executor, never held per game
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self.analyze_game_mistakes, job[5], job[2], None,
+                                    tail_resignations and self._is_resignation_loss(job[3], job[4]),
+                                    job[6]): job[0]
+                    for job in jobs
+                }
+                
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error analyzing game {idx}: {e}")
+                    
+                    # Log progress every 10 games
+                    if completed % 10 == 0:
+                        logger.info(f"Analyzed {completed}/{total_games} games")
+                    
+                    # Report progress to callback if provided
+                    if progress_callback:
+                        progress_callback(completed, total_games)
+        finally:
+            self._position_executor.shutdown(wait=True)
+            self._position_executor = None
+            if self._cloud_executor is not None:
+                self._cloud_executor.shutdown(wait=True)
+                self._cloud_executor = None
+            self._engine_pool = None
+            if self.eval_db is not None:
+                self.eval_db.flush()  # Commit this batch even if the engine stays warm
+        
+        return results
+    
+    def _count_player_moves(self, parsed: Tuple[chess.Board, List[chess.Move]], player_color: str) -> Dict:
+        """
+        Count the player's moves per stage without any engine analysis (Iteration 13).
+        
+        Args:
+            parsed: (starting board, mainline moves) of the game
+            player_color: 'white' or 'black'
+            
+        Returns:
+            Per-stage statistics in the analyze_game_mistakes format (only total_moves set)
+        """
+        mistakes = new_game_stats()
+        start_board, moves = parsed
+        player_turn = chess.WHITE if player_color.lower() == 'white' else chess.BLACK
+        player_parity = 1 if start_board.turn == player_turn else 0
+        for ply in range(1, len(moves) + 1):
+            if ply & 1 == player_parity:
+                mistakes[self._get_stage((ply + 1) // 2)].total_moves += 1
+        return game_stats_to_dict(mistakes)
+    
+    @staticmethod
+    def _is_resignation_loss(player_result: Optional[str], termination: Optional[str]) -> bool:
+        """
+        Check whether the player lost the game by resignation (PRD v2.1 critical game criteria).
+        
+        Args:
+            player_result: Chess.com result for the player ('resigned', 'win', ...)
+            termination: Termination text ('... won by resignation')
+            
+        Returns:
+            True if the game is a loss that ended by resignation
+        """
+        # Iteration 13: Frozenset lookup and a case-insensitive search (no lowercased copy)
+        return player_result in LOSS_RESULTS and bool(termination) and \
+            RESIGNATION_RE.search(termination) is not None
+    
+    def _game_worth_analyzing(self, game_data: Dict) -> bool:
+        """
+        Check whether a game is worth engine time, using a quick scan of the PGN text.
+        Iteration 13: Bullet games (engine noise > player signal) and games shorter
+        than MIN_GAME_MOVES are skipped. Unknown time controls are kept.
+        
+        Args:
+            game_data: Game dictionary with 'pgn' and optionally 'time_control'
+            
+        Returns:
+            True if the game should be analyzed
+        """
+        pgn = game_data.get('pgn', '')
+        
+        time_control = game_data.get('time_control')
+        if not time_control:
+            header = TIME_CONTROL_HEADER_RE.search(pgn)
+            time_control = header.group(1) if header else ''
+        base = self._base_time_seconds(time_control)
+        if base is not None and base < self.min_time_control_seconds:
+            return False
+        
+        movetext = PGN_COMMENT_RE.sub('', PGN_HEADER_RE.sub('', pgn))
+        return len(MOVE_NUMBER_RE.findall(movetext)) >= self.MIN_GAME_MOVES
+    
+    @staticmethod
+    def _base_time_seconds(time_control: str) -> Optional[int]:
+        """
+        Parse the base time from a PGN/Chess.com time control.
+        
+        Args:
+            time_control: e.g. '600', '180+2' or '1/86400' (daily)
+            
+        Returns:
+            Base time in seconds, or None if unknown
+        """
+        base = str(time_control).split('+', 1)[0].rsplit('/', 1)[-1]
+        return int(base) if base.isdigit() else None
+    
+    def _sample_game_stream(self, games: Iterable[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Thin a stream of games to an evenly spaced sample in a single pass.
+        Iteration 13: Same filter and fallback as for lists (games worth analyzing,
+        or all games if none qualify); at most 2 * max_analysis_games are kept.
+        
+        Args:
+            games: Iterable of game dictionaries, consumed once
+            
+        Returns:
+            (evenly spaced candidate games in stream order, total number of games)
+        """
+        worth_analyzing = EvenSample(self.max_analysis_games)
+        every_game = EvenSample(self.max_analysis_games)
+        for game_data in games:
+            every_game.add(game_data)
+            if self._game_worth_analyzing(game_data):
+                worth_analyzing.add(game_data)
+        
+        candidates = worth_analyzing if worth_analyzing.seen else every_game
+        return candidates.items, every_game.seen
+    
     def _select_games_for_analysis(self, games_data: List[Dict], max_games: int) -> List[Dict]:
         """
         Select games for analysis using time-distributed sampling.
@@ -702,34 +1828,13 @@ class MistakeAnalysisService:
     
     def _empty_aggregation(self) -> Dict:
         """Return empty aggregation structure (PRD v2.5: includes move quality metrics)."""
-        return {
-            'early': {
-                'total_moves': 0, 'inaccuracies': 0, 'mistakes': 0, 'blunders': 0,
-                'missed_opps': 0, 'cp_losses': [], 'worst_game': None, 'avg_cp_loss': 0,
-                'critical_mistake_game': None,
-                'brilliant_moves': 0, 'neutral_moves': 0, 'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0, 'avg_neutral_per_game': 0.0, 'avg_mistakes_per_game': 0.0
-            },
-            'middle': {
-                'total_moves': 0, 'inaccuracies': 0, 'mistakes': 0, 'blunders': 0,
-                'missed_opps': 0, 'cp_losses': [], 'worst_game': None, 'avg_cp_loss': 0,
-                'critical_mistake_game': None,
-                'brilliant_moves': 0, 'neutral_moves': 0, 'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0, 'avg_neutral_per_game': 0.0, 'avg_mistakes_per_game': 0.0
-            },
-            'endgame': {
-                'total_moves': 0, 'inaccuracies': 0, 'mistakes': 0, 'blunders': 0,
-                'missed_opps': 0, 'cp_losses': [], 'worst_game': None, 'avg_cp_loss': 0,
-                'critical_mistake_game': None,
-                'brilliant_moves': 0, 'neutral_moves': 0, 'mistake_moves': 0,
-                'avg_brilliant_per_game': 0.0, 'avg_neutral_per_game': 0.0, 'avg_mistakes_per_game': 0.0
-            },
-            'sample_info': {
-                'total_games': 0,
-                'analyzed_games': 0,
-                'sample_percentage': 0
-            }
+        aggregated = {stage: new_stage_aggregate() for stage in STAGES}
+        aggregated['sample_info'] = {
+            'total_games': 0,
+            'analyzed_games': 0,
+            'sample_percentage': 0
         }
+        return aggregated
     
     def get_weakest_stage(self, aggregated: Dict) -> Tuple[str, str]:
         """
@@ -758,11 +1863,11 @@ class MistakeAnalysisService:
             else:
                 mistake_rates[stage] = 0
         
-        # Find stage with highest mistake rate
-        if max(mistake_rates.values()) == 0:
+        # Find stage with highest mistake rate (Iteration 13: single pass, first stage wins ties)
+        weakest_stage, weakest_rate = max(mistake_rates.items(), key=itemgetter(1))
+        if weakest_rate == 0:
             return ('N/A', 'No mistakes detected')
         
-        weakest_stage = max(mistake_rates, key=mistake_rates.get)
         stage_display = {
             'early': 'Early game',
             'middle': 'Middlegame',
@@ -771,5 +1876,5 @@ class MistakeAnalysisService:
         
         return (
             stage_display.get(weakest_stage, weakest_stage),
-            f"Highest mistake rate: {mistake_rates[weakest_stage]:.1%}"
+            f"Highest mistake rate: {weakest_rate:.1%}"
         )
@@ -0,0 +1,147 @@
+"""
+Transposition cache for chess position evaluations.
+Iteration 13: Position-keyed LRU shared by every MistakeAnalysisService instance,
+so positions repeated across games (openings, common endgames) and across user
+requests are evaluated by the engine only once per process.
+Iteration 13: Optional SQLite tier (EvalCacheDB) persists evaluations across restarts.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import sqlite3
+import threading
+
+# In-memory LRU storage: key -> evaluation entry (e.g. centipawn score, best move)
+_eval_cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+_lock = threading.Lock()
+
+# Configuration
+EVAL_CACHE_MAX_SIZE = 200_000  # Entries kept before evicting least recently used
+
+
+def get_cached_eval(key: Hashable) -> Optional[Any]:
+    """
+    Look up a cached evaluation and mark it as recently used.
+    
+    Args:
+        key: Cache key (position hash + search settings)
+        
+    Returns:
+        Cached evaluation entry, or None if not cached
+    """
+    with _lock:
+        entry = _eval_cache.get(key)
+        if entry is not None:
+            _eval_cache.move_to_end(key)
+        return entry
+
+
+def store_eval(key: Hashable, entry: Any) -> None:
+    """
+    Store an evaluation, evicting the least recently used entries past the size cap.
+    
+    Args:
+        key: Cache key (position hash + search settings)
+        entry: Evaluation entry (centipawn score from the side to move's perspective,
+            optionally with the engine's best move)
+    """
+    with _lock:
+        _eval_cache[key] = entry
+        _eval_cache.move_to_end(key)
+        while len(_eval_cache) > EVAL_CACHE_MAX_SIZE:
+            _eval_cache.popitem(last=False)
+
+
+def clear_eval_cache() -> None:
+    """Clear all cached evaluations."""
+    with _lock:
+        _eval_cache.clear()
+
+
+class EvalCacheDB:
+    """
+    SQLite store for evaluations that outlives the process.
+    Iteration 13: Second tier behind the in-memory LRU, so restarts and repeat
+    analyses of the same openings do not search the same positions again.
+    Writes are committed in batches (WAL journal) rather than per evaluation.
+    """
+    
+    COMMIT_EVERY = 256  # Pending writes before an automatic commit
+    
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the evaluation database.
+        
+        Args:
+            path: SQLite database file
+        """
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending = 0
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS evals ('
+                'zobrist INTEGER NOT NULL, signature TEXT NOT NULL, reduced INTEGER NOT NULL, '
+                'cp INTEGER NOT NULL, best_move TEXT, '
+                'PRIMARY KEY (zobrist, signature, reduced)) WITHOUT ROWID'
+            )
+            self._conn.commit()
+    
+    @staticmethod
+    def _signed(zobrist: int) -> int:
+        """Map an unsigned 64-bit Zobrist hash onto SQLite's signed INTEGER range."""
+        return zobrist - (1 << 64) if zobrist >= (1 << 63) else zobrist
+    
+    def get(self, zobrist: int, signature: str, reduced: bool) -> Optional[Tuple[int, Optional[str]]]:
+        """
+        Look up a stored evaluation.
+        
+        Args:
+            zobrist: Position hash
+            signature: Search settings the evaluation was made with
+            reduced: Whether the reduced search budget was used
+            
+        Returns:
+            (centipawns, best move in UCI or None), or None if not stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cp, best_move FROM evals WHERE zobrist = ? AND signature = ? AND reduced = ?',
+                (self._signed(zobrist), signature, int(reduced))
+            ).fetchone()
+        return row
+    
+    def put(self, zobrist: int, signature: str, reduced: bool, cp: int, best_move: Optional[str]) -> None:
+        """
+        Store an evaluation (committed with the next batch).
+        
+        Args:
+            zobrist: Position hash
+            signature: Search settings the evaluation was made with
+            reduced: Whether the reduced search budget was used
+            cp: Centipawns from the side to move's perspective
+            best_move: Engine best move in UCI, or None
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO evals (zobrist, signature, reduced, cp, best_move) VALUES (?, ?, ?, ?, ?)',
+                (self._signed(zobrist), signature, int(reduced), cp, best_move)
+            )
+            self._pending += 1
+            if self._pending >= self.COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+    
+    def flush(self) -> None:
+        """Commit pending writes."""
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+    
+    def close(self) -> None:
+        """Commit pending writes and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,82 @@
+"""
+Process-wide idle Stockfish engines.
+Iteration 13: Engines released by one MistakeAnalysisService are parked here and handed
+to the next service started with the same engine settings, so services created per
+request skip the process spawn and keep the engine's hash table warm.
+"""
+from typing import Dict, Hashable, List, Optional
+import atexit
+import logging
+import threading
+
+import chess.engine
+
+logger = logging.getLogger(__name__)
+
+_idle: Dict[Hashable, List[chess.engine.SimpleEngine]] = {}
+_lock = threading.Lock()
+
+
+def checkout_idle_engine(key: Hashable) -> Optional[chess.engine.SimpleEngine]:
+    """
+    Take a parked engine started with the given settings.
+    
+    Args:
+        key: Engine settings the engine was started with
+        
+    Returns:
+        Responsive engine, or None if none is parked
+    """
+    while True:
+        with _lock:
+            engines = _idle.get(key)
+            if not engines:
+                return None
+            engine = engines.pop()
+
+        try:
+            engine.ping()  # Drop engines whose process died while parked
+            return engine
+        except Exception as e:
+            logger.warning(f"Discarding unresponsive parked engine: {e}")
+            _quit(engine)
+
+
+def park_engine(key: Hashable, engine: chess.engine.SimpleEngine, max_idle: int) -> bool:
+    """
+    Park an engine for reuse by a later service.
+    
+    Args:
+        key: Engine settings the engine was started with
+        engine: Engine no longer used by its service
+        max_idle: Maximum engines kept for these settings
+        
+    Returns:
+        True if the engine was parked (False: the caller should quit it)
+    """
+    with _lock:
+        engines = _idle.setdefault(key, [])
+        if len(engines) >= max_idle:
+            return False
+        engines.append(engine)
+        return True
+
+
+def close_idle_engines() -> None:
+    """Quit every parked engine."""
+    with _lock:
+        engines = [engine for parked in _idle.values() for engine in parked]
+        _idle.clear()
+
+    for engine in engines:
+        _quit(engine)
+
+
+def _quit(engine: chess.engine.SimpleEngine) -> None:
+    try:
+        engine.quit()
+    except Exception as e:
+        logger.debug(f"Error stopping parked engine: {e}")
+
+
+atexit.register(close_idle_engines)
@@ -0,0 +1,42 @@
+"""
+Process-wide polyglot opening book readers.
+Iteration 13: A book is opened (memory-mapped) once per process and shared by every
+MistakeAnalysisService, so services created per request do not re-open the file
+before their first book lookup.
+"""
+from typing import Dict
+import threading
+
+import chess.polyglot
+
+_readers: Dict[str, chess.polyglot.MemoryMappedReader] = {}
+_lock = threading.Lock()
+
+
+def get_book_reader(path: str) -> chess.polyglot.MemoryMappedReader:
+    """
+    Return the shared reader for a polyglot book, opening it on first use.
+    
+    Args:
+        path: Path to the polyglot (.bin) book
+        
+    Returns:
+        Memory-mapped book reader (safe for concurrent lookups)
+        
+    Raises:
+        OSError: If the book cannot be opened
+    """
+    with _lock:
+        reader = _readers.get(path)
+        if reader is None:
+            reader = chess.polyglot.open_reader(path)
+            _readers[path] = reader
+        return reader
+
+
+def close_book_readers() -> None:
+    """Close every shared book reader."""
+    with _lock:
+        for reader in _readers.values():
+            reader.close()
+        _readers.clear()
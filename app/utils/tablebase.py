@@ -0,0 +1,42 @@
+"""
+Process-wide Syzygy endgame tablebases.
+Iteration 13: Tablebase files are opened (memory-mapped) once per process and shared by
+every MistakeAnalysisService, so endgame positions with few pieces are scored by a
+lookup instead of an engine search.
+"""
+from typing import Dict
+import threading
+
+import chess.syzygy
+
+_tablebases: Dict[str, chess.syzygy.Tablebase] = {}
+_lock = threading.Lock()
+
+
+def get_tablebase(path: str) -> chess.syzygy.Tablebase:
+    """
+    Return the shared tablebase for a Syzygy directory, opening it on first use.
+    
+    Args:
+        path: Directory containing Syzygy .rtbw/.rtbz files
+        
+    Returns:
+        Tablebase (safe for concurrent probes)
+        
+    Raises:
+        OSError: If the directory cannot be opened
+    """
+    with _lock:
+        tablebase = _tablebases.get(path)
+        if tablebase is None:
+            tablebase = chess.syzygy.open_tablebase(path)
+            _tablebases[path] = tablebase
+        return tablebase
+
+
+def close_tablebases() -> None:
+    """Close every shared tablebase."""
+    with _lock:
+        for tablebase in _tablebases.values():
+            tablebase.close()
+        _tablebases.clear()
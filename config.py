@@ -53,6 +53,31 @@ class Config:
     MAX_ANALYSIS_GAMES = int(os.environ.get('MAX_ANALYSIS_GAMES', '10'))  # Cap on games analyzed
     MOVES_PER_GAME = int(os.environ.get('MOVES_PER_GAME', '15'))  # Moves per game (5 early + 5 mid + 5 end)
     
+    # Iteration 13: Parallel game analysis (one single-threaded Stockfish process per worker)
+    ENGINE_WORKERS = int(os.environ.get('ENGINE_WORKERS', '0'))  # 0 = one worker per CPU core
+    
+    # Iteration 13: Keep stopped Stockfish processes for the next request (warm hash, no respawn)
+    ENGINE_KEEP_ALIVE = os.environ.get('ENGINE_KEEP_ALIVE', 'False').lower() == 'true'
+    
+    # Iteration 13: Only engine-search games lost by resignation (critical mistake candidates)
+    MISTAKE_CRITICAL_ONLY = os.environ.get('MISTAKE_CRITICAL_ONLY', 'False').lower() == 'true'
+    
+    # Iteration 13: Stockfish Threads/Hash per engine process (0 = auto from cores/RAM)
+    ENGINE_THREADS = int(os.environ.get('ENGINE_THREADS', '0'))
+    ENGINE_HASH_MB = int(os.environ.get('ENGINE_HASH_MB', '0'))
+    
+    # Iteration 13: Optional polyglot (.bin) opening book - early-game book moves skip engine analysis
+    OPENING_BOOK_PATH = os.environ.get('OPENING_BOOK_PATH', '')  # Empty = no book
+    
+    # Iteration 13: Optional Syzygy tablebase directory - endgames with <= 7 pieces skip the engine
+    SYZYGY_PATH = os.environ.get('SYZYGY_PATH', '')  # Empty = no tablebases
+    
+    # Iteration 13: Optional SQLite file that persists engine evaluations across restarts
+    EVAL_CACHE_DB_PATH = os.environ.get('EVAL_CACHE_DB_PATH', '')  # Empty = in-memory cache only
+    
+    # Iteration 13: Skip bullet games in mistake analysis (base time in seconds, 0 = analyze all)
+    MIN_TIME_CONTROL_SECONDS = int(os.environ.get('MIN_TIME_CONTROL_SECONDS', '180'))
+    
     # Mistake Analysis UI visibility (Iteration 11.1)
     # Iteration 12: Re-enabled by default with faster analysis
     MISTAKE_ANALYSIS_UI_ENABLED = os.environ.get('MISTAKE_ANALYSIS_UI_ENABLED', 'True').lower() == 'true'
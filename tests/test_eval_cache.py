@@ -0,0 +1,61 @@
+"""
+Unit tests for the evaluation transposition cache.
+Iteration 13: Zobrist-keyed LRU shared across analysis runs
+"""
+import pytest
+from app.utils import eval_cache
+from app.utils.eval_cache import EvalCacheDB, get_cached_eval, store_eval, clear_eval_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_eval_cache()
+    yield
+    clear_eval_cache()
+
+
+class TestEvalCache:
+    """Test cases for the evaluation cache."""
+    
+    def test_miss_returns_none(self):
+        """Unknown keys are cache misses."""
+        assert get_cached_eval(('unknown', 1)) is None
+    
+    def test_store_and_get(self):
+        """Stored evaluations are returned, including zero scores."""
+        store_eval(('pos', 1), 35)
+        store_eval(('equal', 1), 0)
+        
+        assert get_cached_eval(('pos', 1)) == 35
+        assert get_cached_eval(('equal', 1)) == 0
+    
+    def test_evicts_least_recently_used(self, monkeypatch):
+        """Entries past the size cap are evicted in LRU order."""
+        monkeypatch.setattr(eval_cache, 'EVAL_CACHE_MAX_SIZE', 2)
+        store_eval('a', 1)
+        store_eval('b', 2)
+        get_cached_eval('a')  # 'a' becomes most recently used
+        store_eval('c', 3)
+        
+        assert get_cached_eval('b') is None
+        assert get_cached_eval('a') == 1
+        assert get_cached_eval('c') == 3
+
+
+class TestEvalCacheDB:
+    """Test cases for the persistent SQLite evaluation store."""
+    
+    def test_round_trip_across_connections(self, tmp_path):
+        """Evaluations survive closing the database, including high Zobrist hashes."""
+        path = str(tmp_path / 'evals.db')
+        db = EvalCacheDB(path)
+        db.put(2 ** 64 - 5, 'sig', True, 35, 'e2e4')
+        db.put(7, 'sig', False, -20, None)
+        db.close()
+        
+        db = EvalCacheDB(path)
+        assert db.get(2 ** 64 - 5, 'sig', True) == (35, 'e2e4')
+        assert db.get(7, 'sig', False) == (-20, None)
+        assert db.get(7, 'sig', True) is None
+        assert db.get(7, 'other', False) is None
+        db.close()
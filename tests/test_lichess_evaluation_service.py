@@ -103,6 +103,85 @@ class TestLichessEvaluationService:
         assert service.stats['hits'] == 0
         assert service.stats['misses'] == 1
     
+    @patch('app.services.lichess_evaluation_service.requests.get')
+    def test_missing_position_is_not_requested_again(self, mock_get):
+        """Test that a position absent from the cloud is only requested once (Iteration 13)."""
+        mock_response = Mock()
+        mock_response.status_code = 404
+        mock_get.return_value = mock_response
+        
+        service = LichessEvaluationService()
+        fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        
+        assert service.evaluate_position(fen) is None
+        assert service.evaluate_position(fen) is None
+        
+        assert mock_get.call_count == 1
+        assert service.stats['api_calls'] == 1
+    
+    @patch('app.services.lichess_evaluation_service.time.monotonic')
+    @patch('app.services.lichess_evaluation_service.requests.get')
+    def test_rate_limit_pauses_lookups(self, mock_get, mock_monotonic):
+        """Test that a 429 response pauses lookups without forgetting the position (Iteration 13)."""
+        mock_response = Mock()
+        mock_response.status_code = 429
+        mock_get.return_value = mock_response
+        mock_monotonic.return_value = 100.0
+        
+        service = LichessEvaluationService()
+        fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        other = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+        
+        assert service.evaluate_position(fen) is None
+        assert service.evaluate_position(fen) is None
+        assert service.evaluate_position(other) is None
+        assert mock_get.call_count == 1
+        assert service.stats['errors'] == 1
+        assert service.stats['misses'] == 0
+        
+        # Once the window has passed, the same position is requested again
+        mock_monotonic.return_value = 100.0 + service.RATE_LIMIT_BACKOFF
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"depth": 30, "pvs": [{"cp": 20}]}
+        assert service.evaluate_position(fen) == 20
+        assert mock_get.call_count == 2
+    
+    @patch('app.services.lichess_evaluation_service.requests.get')
+    def test_remembered_misses_are_capped(self, mock_get):
+        """Test that only the most recent misses are remembered (Iteration 13)."""
+        mock_response = Mock()
+        mock_response.status_code = 404
+        mock_get.return_value = mock_response
+        
+        service = LichessEvaluationService()
+        service.MISSING_CACHE_SIZE = 2
+        fens = [f"7k/8/8/8/8/8/8/{rank} w - - 0 1" for rank in ("K7", "1K6", "2K5")]
+        
+        for fen in fens:
+            service.evaluate_position(fen)
+        service.evaluate_position(fens[0])  # Evicted, so requested again
+        
+        assert len(service._missing) == 2
+        assert mock_get.call_count == 4
+    
+    @patch('app.services.lichess_evaluation_service.requests.get')
+    def test_concurrent_lookups_are_all_counted(self, mock_get):
+        """Test that stats stay exact when lookups run on several threads (Iteration 13)."""
+        from concurrent.futures import ThreadPoolExecutor
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"pvs": [{"cp": 10}]}
+        mock_get.return_value = mock_response
+        
+        service = LichessEvaluationService()
+        fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(service.evaluate_position, [fen] * 400))
+        
+        assert results == [10] * 400
+        assert service.get_stats()['api_calls'] == 400
+        assert service.get_stats()['hits'] == 400
+    
     @patch('app.services.lichess_evaluation_service.requests.get')
     def test_evaluate_position_timeout(self, mock_get):
         """Test timeout handling."""
@@ -2,8 +2,34 @@
 Unit tests for Mistake Analysis Service
 Tests the strategic move sampling logic
 """
+import queue
+import struct
+import chess
+import chess.engine
+import chess.pgn
+import chess.polyglot
 import pytest
-from app.services.mistake_analysis_service import MistakeAnalysisService
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, Mock, patch
+from io import StringIO
+from app.services.mistake_analysis_service import EvenSample, MistakeAnalysisService, MainlineMovesVisitor, parse_mainline
+from app.models.mistake_stats import new_game_stats
+from app.utils.eval_cache import clear_eval_cache
+from app.utils.idle_engines import close_idle_engines
+from app.utils.opening_book import close_book_readers
+
+
+def make_engine(cp=0, depth=10):
+    """Mock engine whose streaming analysis reports a single centipawn score"""
+    engine = MagicMock()
+    info = {'depth': depth, 'score': chess.engine.PovScore(chess.engine.Cp(cp), chess.WHITE)}
+    engine.analysis.return_value.__enter__.return_value = [info]
+    return engine
+
+
+def selected_indices(mask):
+    """Move indices marked in a _select_moves_to_analyze mask"""
+    return [i for i, flag in enumerate(mask) if flag]
 
 
 class TestMoveSelectionLogic:
@@ -16,18 +42,18 @@ class TestMoveSelectionLogic:
     def test_select_moves_small_game(self, service):
         """Test that games with ≤30 moves analyze all moves"""
         # 20 moves - should analyze all
-        result = service._select_moves_to_analyze(20)
+        result = selected_indices(service._select_moves_to_analyze(20))
         assert len(result) == 20
-        assert result == set(range(20))
+        assert result == list(range(20))
         
         # 30 moves - should analyze all (boundary case)
-        result = service._select_moves_to_analyze(30)
+        result = selected_indices(service._select_moves_to_analyze(30))
         assert len(result) == 30
-        assert result == set(range(30))
+        assert result == list(range(30))
     
     def test_select_moves_medium_game(self, service):
         """Test strategic sampling for 40-move game"""
-        result = service._select_moves_to_analyze(40)
+        result = selected_indices(service._select_moves_to_analyze(40))
         
         # Should analyze 30 moves (first 10 + last 10 + middle 10)
         assert len(result) == 30
@@ -46,7 +72,7 @@ class TestMoveSelectionLogic:
     
     def test_select_moves_large_game(self, service):
         """Test strategic sampling for 60-move game"""
-        result = service._select_moves_to_analyze(60)
+        result = selected_indices(service._select_moves_to_analyze(60))
         
         # Should analyze exactly 30 moves
         assert len(result) == 30
@@ -72,7 +98,7 @@ class TestMoveSelectionLogic:
     
     def test_select_moves_very_large_game(self, service):
         """Test strategic sampling for 80-move game"""
-        result = service._select_moves_to_analyze(80)
+        result = selected_indices(service._select_moves_to_analyze(80))
         
         # Should still analyze exactly 30 moves (capped)
         assert len(result) == 30
@@ -88,7 +114,7 @@ class TestMoveSelectionLogic:
     
     def test_select_moves_edge_case_31_moves(self, service):
         """Test edge case with 31 moves (just over boundary)"""
-        result = service._select_moves_to_analyze(31)
+        result = selected_indices(service._select_moves_to_analyze(31))
         
         # Should apply sampling logic and return 30 moves
         assert len(result) == 30
@@ -106,23 +132,30 @@ class TestMoveSelectionLogic:
         """Test boundary conditions"""
         # Test with 1 move
         result = service._select_moves_to_analyze(1)
-        assert result == {0}
+        assert selected_indices(result) == [0]
         
         # Test with 0 moves (edge case)
         result = service._select_moves_to_analyze(0)
-        assert result == set()
+        assert len(result) == 0
+    
+    def test_resigned_loss_samples_final_moves(self, service):
+        """Resignation losses only sample the last RESIGNED_TAIL_MOVES moves"""
+        assert selected_indices(service._select_moves_to_analyze(40, resigned_loss=True)) == list(range(30, 40))
+        assert selected_indices(service._select_moves_to_analyze(6, resigned_loss=True)) == list(range(6))
+        assert service._is_resignation_loss('resigned', 'opp won by resignation')
+        assert not service._is_resignation_loss('timeout', 'opp won on time')
+        assert not service._is_resignation_loss('win', 'me won by resignation')
+        assert service._is_resignation_loss('lose', 'Opp won by Resignation')
+        assert not service._is_resignation_loss('resigned', None)
     
     def test_move_indices_valid(self, service):
         """Ensure all returned indices are within valid range"""
         for total_moves in [10, 30, 40, 60, 80, 100]:
-            result = service._select_moves_to_analyze(total_moves)
+            mask = service._select_moves_to_analyze(total_moves)
             
-            # All indices should be within range [0, total_moves)
-            for idx in result:
-                assert 0 <= idx < total_moves, f"Invalid index {idx} for {total_moves} total moves"
-            
-            # Should not have duplicates (is a set)
-            assert len(result) == len(set(result))
+            # One flag per move, so all indices are within range [0, total_moves)
+            assert len(mask) == total_moves, f"Mask length {len(mask)} for {total_moves} total moves"
+            assert set(mask) <= {0, 1}
 
 
 class TestMistakeAnalysisConfiguration:
@@ -147,5 +180,825 @@ class TestMistakeAnalysisConfiguration:
         assert service.time_limit == 0.5  # 500ms
 
 
+class TestMistakeClassification:
+    """Test per-game bucketized classification (Iteration 13)"""
+    
+    def test_classify_logged_mistakes(self):
+        """Losses are bucketed by threshold and the first worst mistake is kept"""
+        service = MistakeAnalysisService(enabled=False)
+        mistakes = new_game_stats()
+        log = [
+            ('early', 3, 50), ('early', 5, 99), ('middle', 10, 100),
+            ('middle', 12, 250), ('middle', 14, 250), ('endgame', 30, 199),
+        ]
+        
+        service._classify_logged_mistakes(mistakes, log)
+        
+        assert mistakes['early'].inaccuracies == 2
+        assert mistakes['middle'].mistakes == 1
+        assert mistakes['middle'].blunders == 2
+        assert mistakes['endgame'].mistakes == 1
+        assert mistakes['middle'].cp_loss_sum == 600
+        assert mistakes['middle'].worst_mistake == {'move_number': 12, 'cp_loss': 250, 'type': 'blunder'}
+    
+    def test_classify_mistake_boundaries(self):
+        """Thresholds are inclusive lower bounds"""
+        service = MistakeAnalysisService(enabled=False)
+        expected = {-30: None, 0: None, 49: None, 50: 'inaccuracy', 99: 'inaccuracy',
+                    100: 'mistake', 199: 'mistake', 200: 'blunder', 10000: 'blunder'}
+        for cp_loss, mistake_type in expected.items():
+            assert service._classify_mistake(cp_loss) == mistake_type
+    
+    def test_weakest_stage_is_highest_mistake_rate(self):
+        """The stage with the highest mistake rate wins; no mistakes reports N/A"""
+        service = MistakeAnalysisService(enabled=False)
+        service.enabled = True
+        aggregated = service._empty_aggregation()
+        assert service.get_weakest_stage(aggregated) == ('N/A', 'No mistakes detected')
+
+        aggregated['early'].update(total_moves=10, inaccuracies=1)
+        aggregated['endgame'].update(total_moves=4, blunders=1)
+        assert service.get_weakest_stage(aggregated) == ('Endgame', 'Highest mistake rate: 25.0%')
+
+    def test_stage_table_boundaries(self):
+        """Stage lookup keeps the 7 / 20 move boundaries, including past the table"""
+        service = MistakeAnalysisService(enabled=False)
+        expected = {1: 'early', 7: 'early', 8: 'middle', 20: 'middle', 21: 'endgame', 500: 'endgame'}
+        for move_number, stage in expected.items():
+            assert service._get_stage(move_number) == stage
+
+    def test_percentile_75_matches_sorted_index(self):
+        """The partial selection returns sorted(losses)[int(n * 0.75)]"""
+        for losses in ([120], [50, 400], [300, 50, 900, 75, 210], list(range(50, 1050, 10))):
+            assert MistakeAnalysisService._percentile_75(losses) == sorted(losses)[int(len(losses) * 0.75)]
+    
+    def test_game_result_is_plain_dict(self):
+        """Per-game stats are returned in the dict format the aggregation expects"""
+        result = MistakeAnalysisService(enabled=False).analyze_game_mistakes('', 'white')
+        assert set(result) == {'early', 'middle', 'endgame'}
+        assert result['early']['cp_losses'] == []
+        assert result['endgame']['mistake_moves'] == 0
+
+    def test_aggregate_sums_stage_counters(self):
+        """Per-stage counters and losses are summed across games"""
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False, min_time_control_seconds=0)
+        stats = new_game_stats()
+        service._classify_logged_mistakes(stats, [('middle', 12, 250), ('middle', 15, 80)])
+        stats['middle'].total_moves = 9
+        stats['endgame'].neutral_moves = 3
+        game_result = {stage: stage_stats.to_dict() for stage, stage_stats in stats.items()}
+        games = [{'pgn': '1. e4 e5', 'white': {'username': 'me'}, 'black': {'username': 'opp'}}] * 2
+
+        with patch.object(service, '_start_engine', return_value=MagicMock()), \
+             patch.object(service, 'analyze_game_mistakes', return_value=game_result):
+            result = service.aggregate_mistake_analysis(games, 'me')
+
+        assert result['middle']['total_moves'] == 18
+        assert result['middle']['blunders'] == 2
+        assert result['middle']['inaccuracies'] == 2
+        assert result['middle']['cp_loss_count'] == 4
+        assert result['middle']['avg_cp_loss'] == 165.0
+        assert result['endgame']['avg_neutral_per_game'] == 3.0
+        assert result['early'] == MistakeAnalysisService(enabled=False)._empty_aggregation()['early']
+
+
+class TestGameFilter:
+    """Test the pre-engine game filter (Iteration 13)"""
+    
+    LONG_PGN = '[Date "2024.01.01"]\n[TimeControl "600"]\n\n' + ' '.join(
+        f'{n}. Nf3 {{ [%clk 0:09:59.9] }} {n}... Nf6 {n + 1}. Ng1 {n + 1}... Ng8'
+        for n in range(1, 12, 2)
+    )
+    
+    @pytest.fixture
+    def service(self):
+        return MistakeAnalysisService(enabled=False)
+    
+    def test_long_rapid_game_is_kept(self, service):
+        assert service._game_worth_analyzing({'pgn': self.LONG_PGN})
+        assert service._game_worth_analyzing({'pgn': self.LONG_PGN, 'time_control': '1/86400'})
+    
+    def test_bullet_game_is_skipped(self, service):
+        assert not service._game_worth_analyzing({'pgn': self.LONG_PGN, 'time_control': '60+1'})
+        bullet_header = self.LONG_PGN.replace('"600"', '"120+1"')
+        assert not service._game_worth_analyzing({'pgn': bullet_header})
+    
+    def test_short_game_is_skipped(self, service):
+        """Header dates and clock comments are not counted as moves"""
+        assert not service._game_worth_analyzing({'pgn': '[Date "2024.01.01"]\n\n1. e4 { [%clk 0:02:59.9] } 1... e5 0-1'})
+    
+    def test_filter_disabled(self):
+        service = MistakeAnalysisService(enabled=False, min_time_control_seconds=0)
+        assert service._game_worth_analyzing({'pgn': self.LONG_PGN, 'time_control': '60'})
+    
+    def test_aggregate_skips_filtered_games(self):
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False)
+        games = [
+            {'pgn': self.LONG_PGN, 'white': {'username': 'me'}, 'black': {'username': 'opp'}},
+            {'pgn': self.LONG_PGN, 'time_control': '60', 'white': {'username': 'me'}, 'black': {'username': 'opp'}},
+        ]
+        with patch.object(service, '_start_engine', return_value=Mock()), \
+             patch.object(service, 'analyze_game_mistakes',
+                          return_value=MistakeAnalysisService(enabled=False).analyze_game_mistakes('', 'white')):
+            result = service.aggregate_mistake_analysis(games, 'me')
+        
+        assert result['sample_info']['total_games'] == 2
+        assert result['sample_info']['analyzed_games'] == 1
+
+    def test_no_pgns_never_starts_engine(self):
+        """Stockfish is not spawned when no game has a readable PGN"""
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False)
+        games = [{'pgn': pgn, 'white': {'username': 'me'}, 'black': {'username': 'opp'}} for pgn in ('', '\n\n')]
+        with patch.object(service, '_start_engine') as start:
+            assert service.aggregate_mistake_analysis([], 'me')['sample_info']['analyzed_games'] == 0
+            result = service.aggregate_mistake_analysis(games, 'me')
+
+        start.assert_not_called()
+        assert result['sample_info']['total_games'] == 2
+        assert result['middle']['total_moves'] == 0
+
+    def test_critical_only_searches_resignation_losses(self):
+        """Games that cannot be critical only count their moves, without the engine"""
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False)
+        won = {'pgn': self.LONG_PGN, 'white': {'username': 'me', 'result': 'win'}, 'black': {'username': 'opp'}}
+        with patch.object(service, '_start_engine') as start:
+            result = service.aggregate_mistake_analysis([won], 'me', critical_only=True)
+
+        start.assert_not_called()
+        assert result['early']['total_moves'] == 7
+        assert result['middle']['total_moves'] == 5
+        assert result['early']['mistake_moves'] == 0
+
+        resigned = {'pgn': self.LONG_PGN, 'white': {'username': 'me', 'result': 'resigned',
+                                                    'termination': 'opp won by resignation'},
+                    'black': {'username': 'opp'}}
+        searched = MistakeAnalysisService(enabled=False).analyze_game_mistakes('', 'white')
+        searched['early']['neutral_moves'] = 4
+        critical_service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False, critical_only=True)
+        with patch.object(critical_service, '_start_engine', return_value=MagicMock()), \
+             patch.object(critical_service, 'analyze_game_mistakes', return_value=searched) as analyze:
+            result = critical_service.aggregate_mistake_analysis([won, resigned], 'me')
+
+        analyze.assert_called_once()
+        assert result['early']['total_moves'] == 7
+        # The count-only game is left out of the per-game averages
+        assert result['early']['avg_neutral_per_game'] == 4.0
+
+    def test_resigned_loss_keeps_stage_sample_by_default(self):
+        """Only critical-only runs narrow a resignation loss to its final moves"""
+        clear_eval_cache()
+        pgn = '[TimeControl "600"]\n\n' + ' '.join(
+            f'{n}. Nf3 {n}... Nf6 {n + 1}. Ng1 {n + 1}... Ng8' for n in range(1, 30, 2)
+        )
+        resigned = {'pgn': pgn, 'white': {'username': 'me', 'result': 'resigned',
+                                          'termination': 'opp won by resignation'},
+                    'black': {'username': 'opp'}}
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False)
+
+        with patch.object(service, '_start_engine', return_value=make_engine(0)):
+            result = service.aggregate_mistake_analysis([resigned], 'me')
+        assert result['early']['neutral_moves'] == service.MOVES_PER_STAGE
+
+        with patch.object(service, '_start_engine', return_value=make_engine(0)):
+            result = service.aggregate_mistake_analysis([resigned], 'me', critical_only=True)
+        assert result['early']['neutral_moves'] == 0
+        assert result['endgame']['neutral_moves'] == service.RESIGNED_TAIL_MOVES
+        clear_eval_cache()
+
+    def test_even_sample_spans_stream(self):
+        sample = EvenSample(10)
+        for i in range(100):
+            sample.add(i)
+        assert sample.seen == 100
+        assert sample.items == list(range(0, 100, 8))
+    
+    def test_aggregate_accepts_game_stream(self):
+        """A generator is consumed once and sampled across its whole length"""
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False, max_analysis_games=4)
+        games = ({'pgn': self.LONG_PGN, 'url': str(i), 'white': {'username': 'me'}, 'black': {'username': 'opp'}}
+                 for i in range(40))
+        analyzed = []
+        
+        with patch.object(service, '_start_engine', return_value=Mock()), \
+             patch.object(service, '_analyze_games_parallel',
+                          side_effect=lambda jobs, total, cb, *_: analyzed.extend(j[1]['url'] for j in jobs) or {}):
+            result = service.aggregate_mistake_analysis(games, 'me')
+        
+        assert result['sample_info']['total_games'] == 40
+        assert result['sample_info']['analyzed_games'] == 4
+        assert analyzed[0] == '0' and int(analyzed[-1]) >= 24
+
+
+class TestParallelGameAnalysis:
+    """Test parallel game analysis across an engine pool (Iteration 13)"""
+    
+    def test_worker_count_capped_by_games(self):
+        """Worker count never exceeds the number of games"""
+        service = MistakeAnalysisService(engine_workers=8)
+        assert service._resolve_worker_count(3) == 3
+        assert service._resolve_worker_count(20) == 8
+    
+    def test_worker_count_auto(self):
+        """engine_workers=0 falls back to the CPU count"""
+        service = MistakeAnalysisService(engine_workers=0)
+        with patch('app.services.mistake_analysis_service.os.cpu_count', return_value=2):
+            assert service._resolve_worker_count(10) == 2
+    
+    def test_single_core_pipelines_two_engines(self):
+        """Auto sizing keeps two engines on one core and splits the hash between them"""
+        with patch('app.services.mistake_analysis_service.os.cpu_count', return_value=1), \
+             patch.object(MistakeAnalysisService, '_available_memory_mb', return_value=2048):
+            service = MistakeAnalysisService()
+            assert service._resolve_worker_count(1) == 2
+            assert service._engine_options() == {'Threads': 1, 'Hash': 256}
+            assert MistakeAnalysisService(engine_workers=1)._resolve_worker_count(5) == 1
+    
+    def test_engine_options_split_cores_and_hash(self):
+        """One engine per core gets Threads=1; a single engine gets every core"""
+        with patch('app.services.mistake_analysis_service.os.cpu_count', return_value=4), \
+             patch.object(MistakeAnalysisService, '_available_memory_mb', return_value=4096):
+            assert MistakeAnalysisService()._engine_options() == {'Threads': 1, 'Hash': 256}
+            assert MistakeAnalysisService(engine_workers=1)._engine_options() == {'Threads': 4, 'Hash': 512}
+            assert MistakeAnalysisService(engine_threads=2, engine_hash_mb=64)._engine_options() == \
+                {'Threads': 2, 'Hash': 64}
+    
+    def test_single_game_pool_shares_all_cores(self):
+        """A one-game run on many cores gives each of its two engines half the cores"""
+        game = {'pgn': TestGameFilter.LONG_PGN, 'white': {'username': 'me'}, 'black': {'username': 'opp'}}
+        engines = [Mock(options={'Threads': Mock()}) for _ in range(2)]
+        empty = MistakeAnalysisService(enabled=False).analyze_game_mistakes('', 'white')
+        with patch('app.services.mistake_analysis_service.os.cpu_count', return_value=8), \
+             patch.object(MistakeAnalysisService, '_available_memory_mb', return_value=4096):
+            service = MistakeAnalysisService(use_lichess_cloud=False)
+            assert service._engine_options(service._resolve_worker_count(1)) == {'Threads': 4, 'Hash': 512}
+            with patch.object(service, '_start_engine', side_effect=engines), \
+                 patch.object(service, 'analyze_game_mistakes', return_value=empty):
+                service.aggregate_mistake_analysis([game], 'me')
+        
+        for engine in engines:
+            engine.configure.assert_called_once_with({'Threads': 4})
+    
+    def test_configure_skips_unknown_options(self):
+        """Only options the engine exposes are sent"""
+        service = MistakeAnalysisService(engine_threads=1, engine_hash_mb=32)
+        engine = Mock(options={'Hash': Mock()})
+        service._configure_engine(engine)
+        engine.configure.assert_called_once_with({'Hash': 32})
+
+    def test_pool_engines_share_resolved_options(self):
+        """Options are sized once, not from the RAM left after earlier engines started"""
+        service = MistakeAnalysisService(engine_workers=2)
+        options = {'Threads': Mock(), 'Hash': Mock(), 'UCI_LimitStrength': Mock()}
+        engines = [Mock(options=options), Mock(options=options)]
+        with patch('app.services.mistake_analysis_service.os.cpu_count', return_value=2), \
+             patch.object(MistakeAnalysisService, '_available_memory_mb', side_effect=[4096, 1024]):
+            for engine in engines:
+                service._configure_engine(engine)
+
+        for engine in engines:
+            engine.configure.assert_called_once_with({'Threads': 1, 'Hash': 512, 'UCI_LimitStrength': False})
+
+    def test_engine_pool_serves_all_games(self, caplog):
+        """Positions from every game are searched on pooled engines, all stopped afterwards"""
+        clear_eval_cache()
+        service = MistakeAnalysisService(engine_workers=3, use_lichess_cloud=False)
+        engines = [make_engine(10) for _ in range(3)]
+        openings = ['1. e4 e5', '1. d4 d5', '1. c4 c5', '1. Nf3 Nf6', '1. g3 g6', '1. b3 b6']
+        games = [
+            {'pgn': pgn, 'white': {'username': 'me'}, 'black': {'username': 'opp'}}
+            for pgn in openings
+        ]
+        
+        with patch.object(service, '_start_engine', side_effect=engines):
+            result = service.aggregate_mistake_analysis(games, 'me')
+        
+        assert result['sample_info']['analyzed_games'] == 6
+        assert result['early']['total_moves'] == 6
+        assert sum(engine.analysis.call_count for engine in engines) > 0
+        assert 'Error in aggregate analysis' not in caplog.text
+        assert service._engine_pool is None
+        for engine in engines:
+            engine.quit.assert_called_once()
+        clear_eval_cache()
+
+    def test_batch_prefetches_cloud_evals(self):
+        """Cloud hits are fetched up front and never reach an engine"""
+        clear_eval_cache()
+        service = MistakeAnalysisService(use_lichess_cloud=True)
+        e4, d4 = chess.Board(), chess.Board()
+        e4.push_san('e4')
+        d4.push_san('d4')
+        service.lichess_service = Mock()
+        service.lichess_service.evaluate_position.side_effect = lambda fen: 25 if fen == e4.fen() else None
+        service._cloud_executor = ThreadPoolExecutor(max_workers=2)
+        engine = make_engine(40)
+
+        try:
+            assert service._evaluate_positions_batch([e4, d4], engine) == [(25, None), (40, None)]
+        finally:
+            service._cloud_executor.shutdown()
+        assert engine.analysis.call_count == 1
+        clear_eval_cache()
+
+    def test_cloud_prefetch_skips_known_positions(self):
+        """Positions already cached (any budget) or game over are not sent to the cloud"""
+        clear_eval_cache()
+        service = MistakeAnalysisService(use_lichess_cloud=True)
+        e4, d4, c4 = chess.Board(), chess.Board(), chess.Board()
+        e4.push_san('e4')
+        d4.push_san('d4')
+        c4.push_san('c4')
+        mate = chess.Board('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1')
+        service.lichess_service = Mock()
+        service.lichess_service.evaluate_position.return_value = None
+        service._evaluate_with_best_move(d4, make_engine(40), reduced=True)  # Cached as quiet
+        service.lichess_service.evaluate_position.reset_mock()
+        service._cloud_executor = ThreadPoolExecutor(max_workers=2)
+
+        try:
+            service._prefetch_cloud_evals([e4, d4, c4, mate])
+        finally:
+            service._cloud_executor.shutdown()
+        requested = {call.args[0] for call in service.lichess_service.evaluate_position.call_args_list}
+        assert requested == {service._cloud_fen(e4), service._cloud_fen(c4)}
+        clear_eval_cache()
+
+    def test_batch_evaluation_checks_engines_in_and_out(self):
+        """Batched positions are evaluated in order and every engine returns to the pool"""
+        clear_eval_cache()
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        service._engine_pool = queue.LifoQueue()
+        for cp in (20, 20):
+            service._engine_pool.put(make_engine(cp))
+        service._position_executor = ThreadPoolExecutor(max_workers=2)
+        boards = []
+        for san in ['e4', 'd4', 'c4', 'Nf3']:
+            board = chess.Board()
+            board.push_san(san)
+            boards.append(board)
+        
+        try:
+            assert service._evaluate_positions_batch(boards) == [(20, None)] * 4
+        finally:
+            service._position_executor.shutdown()
+        assert service._engine_pool.qsize() == 2
+        clear_eval_cache()
+    
+    def test_warm_engine_is_reused_across_batches(self):
+        """An engine started by the context manager outlives aggregate calls"""
+        service = MistakeAnalysisService(engine_workers=1, use_lichess_cloud=False)
+        engine = Mock(name='engine')
+        games = [{'pgn': '1. e4 e5', 'white': {'username': 'me'}, 'black': {'username': 'opp'}}]
+        empty = MistakeAnalysisService(enabled=False).analyze_game_mistakes('', 'white')
+        
+        with patch.object(service, '_start_engine', return_value=engine) as start, \
+             patch.object(service, 'analyze_game_mistakes', return_value=empty):
+            with service:
+                service.aggregate_mistake_analysis(games, 'me')
+                service.aggregate_mistake_analysis(games, 'me')
+                engine.quit.assert_not_called()
+        
+        start.assert_called_once()
+        engine.quit.assert_called_once()
+        assert service.engine is None
+
+    def test_kept_engine_is_handed_to_next_service(self):
+        """With keep_engines, a stopped engine is parked and reused by a later service"""
+        engine = MagicMock(name='engine')
+        with patch('chess.engine.SimpleEngine.popen_uci', return_value=engine) as popen:
+            first = MistakeAnalysisService(engine_workers=1, keep_engines=True)
+            assert first.warmup()
+            first.shutdown()
+            engine.quit.assert_not_called()
+            
+            second = MistakeAnalysisService(engine_workers=1, keep_engines=True)
+            assert second.warmup()
+            assert second.engine is engine
+            second.shutdown()
+        
+        popen.assert_called_once()
+        engine.ping.assert_called_once()
+        close_idle_engines()
+        engine.quit.assert_called_once()
+
+
+class TestEvaluationCache:
+    """Test the transposition cache around _evaluate_position (Iteration 13)"""
+    
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        clear_eval_cache()
+        yield
+        clear_eval_cache()
+    
+    def test_transposition_hits_cache(self):
+        """The same position reached by a different move order is evaluated once"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine(25)
+        
+        board_a = chess.Board()
+        for san in ['Nf3', 'Nf6', 'g3']:
+            board_a.push_san(san)
+        board_b = chess.Board()
+        for san in ['g3', 'Nf6', 'Nf3']:
+            board_b.push_san(san)
+        
+        assert service._evaluate_position(board_a, engine) == 25
+        assert service._evaluate_position(board_b, engine) == 25
+        assert engine.analysis.call_count == 1
+    
+    def test_cloud_fallback_evals_do_not_serve_depth_mode(self):
+        """100 ms fallback searches (cloud mode) are not reused by a depth/time service"""
+        board = chess.Board()
+        board.push_san('e4')
+        cloud = MistakeAnalysisService(use_lichess_cloud=True, engine_nodes=0)
+        cloud.lichess_service = Mock()
+        cloud.lichess_service.evaluate_position.return_value = None
+        assert cloud._evaluate_position(board, make_engine(15), full_depth=True) == 15
+        
+        engine = make_engine(40)
+        depth = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=0)
+        assert depth._evaluate_position(board, engine, full_depth=True) == 40
+        assert engine.analysis.call_count == 1
+        assert cloud._search_signature != depth._search_signature
+    
+    def test_history_dependent_positions_are_not_cached(self):
+        """A repeated position (or one near the 50-move rule) is never served from the cache"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        repeated = chess.Board()
+        for san in ['Nf3', 'Nf6', 'Ng1', 'Ng8', 'Nf3']:
+            repeated.push_san(san)
+        fresh = chess.Board()
+        fresh.push_san('Nf3')
+        
+        assert service._evaluate_position(repeated, make_engine(0)) == 0
+        engine = make_engine(25)
+        assert service._evaluate_position(fresh, engine) == 25
+        assert engine.analysis.call_count == 1
+        assert service._position_key(repeated) is None
+        assert service._position_key(chess.Board('4k3/8/8/8/8/8/8/4K2R w K - 95 80')) is None
+        assert service._position_key(fresh) == chess.polyglot.zobrist_hash(fresh)
+    
+    def test_persistent_cache_survives_restart(self, tmp_path):
+        """Evaluations written to the SQLite cache are reused by a fresh service"""
+        path = str(tmp_path / 'evals.db')
+        board = chess.Board()
+        board.push_san('e4')
+        
+        service = MistakeAnalysisService(use_lichess_cloud=False, eval_db_path=path)
+        service._open_eval_db()
+        assert service._evaluate_position(board, make_engine(30), full_depth=True) == 30
+        service._close_eval_db()
+        
+        clear_eval_cache()
+        engine = make_engine(-999)
+        service = MistakeAnalysisService(use_lichess_cloud=False, eval_db_path=path)
+        service._open_eval_db()
+        assert service._evaluate_position(board, engine) == 30  # Full-budget row serves quiet lookup
+        engine.analysis.assert_not_called()
+        service._close_eval_db()
+    
+    def test_opening_positions_use_reduced_budget(self):
+        """Early-stage positions get the reduced budget even when tactical"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=40000)
+        engine = make_engine()
+        
+        with patch.object(service, '_select_moves_to_analyze', return_value=bytearray([0, 1])):
+            service.analyze_game_mistakes('1. e4 d5 2. exd5 Qxd5', 'white', engine=engine)
+        
+        limits = [call[0][1] for call in engine.analysis.call_args_list]
+        assert limits[0] == chess.engine.Limit(nodes=10000)  # exd5 is available: tactical
+    
+    def test_decided_material_uses_reduced_budget(self):
+        """A position two queens and a rook up gets the reduced budget and is skipped once the engine agrees"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=40000)
+        engine = make_engine(2000)
+        pgn = '[FEN "4k3/8/8/8/8/8/8/RQQ1K3 w - - 0 1"]\n\n1. Qb7 Kf8 2. Ra8# 1-0'
+        
+        with patch.object(service, 'REDUCED_BUDGET_STAGES', ()), \
+             patch.object(service, '_select_moves_to_analyze', return_value=bytearray([1, 1])):
+            result = service.analyze_game_mistakes(pgn, 'white', engine=engine)
+        
+        limits = [call[0][1] for call in engine.analysis.call_args_list]
+        assert limits == [chess.engine.Limit(nodes=10000)] * 2  # Pre-move searches only
+        assert result['early']['total_moves'] == 2
+        assert result['early']['mistake_moves'] == 0
+        assert service._is_decided_by_material(chess.Board("4k3/8/8/8/8/8/8/RQQ1K3 w - - 0 1"))
+        assert not service._is_decided_by_material(chess.Board())
+    
+    def test_blunder_in_materially_won_position_is_found(self):
+        """A quiet position a queen and rook up is still searched, so a blunder there counts"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = MagicMock()
+        
+        def analysis(board, limit, **kwargs):
+            # Compensation keeps White at +100; after the blunder Black is +400
+            cp = 100 if board.turn == chess.WHITE else 400
+            search = MagicMock()
+            search.__enter__.return_value = [{'depth': 10, 'score': chess.engine.PovScore(chess.engine.Cp(cp), board.turn)}]
+            return search
+        
+        engine.analysis.side_effect = analysis
+        pgn = '[FEN "4k3/8/8/8/8/8/8/3QK2R w K - 0 1"]\n\n1. Qd7+ Kxd7 *'
+        assert service._is_decided_by_material(chess.Board('4k3/8/8/8/8/8/8/3QK2R w K - 0 1'))
+        
+        with patch.object(service, '_select_moves_to_analyze', return_value=bytearray([1])):
+            result = service.analyze_game_mistakes(pgn, 'white', engine=engine)
+        
+        assert result['early']['blunders'] == 1
+        assert result['early']['neutral_moves'] == 0
+    
+    def test_forced_move_skips_engine(self):
+        """The only legal move is counted as neutral without any engine search"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine()
+        pgn = '[FEN "7k/8/8/8/8/8/8/K5R1 b - - 0 1"]\n\n1... Kh7 2. Kb1 *'
+
+        with patch.object(service, '_select_moves_to_analyze', return_value=bytearray([1])):
+            result = service.analyze_game_mistakes(pgn, 'black', engine=engine)
+
+        engine.analysis.assert_not_called()
+        assert result['early']['neutral_moves'] == 1
+        assert not service._is_forced(chess.Board())
+
+    def test_cloud_fen_ignores_move_counters(self):
+        """The same position at different move numbers is one Lichess Cloud lookup"""
+        early = chess.Board('4k3/8/8/8/8/8/8/4K2R w K - 0 1')
+        late = chess.Board('4k3/8/8/8/8/8/8/4K2R w K - 12 57')
+        assert MistakeAnalysisService._cloud_fen(early) == MistakeAnalysisService._cloud_fen(late)
+        assert MistakeAnalysisService._cloud_fen(late) == early.fen()
+
+    def test_smaller_material_gap_decides_only_quiet_positions(self):
+        """A queen-sized gap is decided when quiet, but not with a capture pending"""
+        service = MistakeAnalysisService(enabled=False)
+        assert service._is_decided_by_material(chess.Board('4k3/8/8/8/8/8/1n6/3QK2R w - - 0 1'))
+        assert not service._is_decided_by_material(chess.Board('4k3/8/8/8/8/8/1n6/3QK2R b - - 0 1'))
+    
+    def test_full_depth_eval_serves_quiet_lookup(self):
+        """A cached full-budget evaluation is reused for a reduced-budget request"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine(15)
+        
+        assert service._evaluate_position(chess.Board(), engine, full_depth=True) == 15
+        assert service._evaluate_position(chess.Board(), engine) == 15
+        assert engine.analysis.call_count == 1
+    
+    def test_cache_keyed_by_search_settings(self):
+        """Evaluations from different search limits are not shared"""
+        shallow = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=10000)
+        deep = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=50000)
+        engine = make_engine(10)
+        
+        shallow._evaluate_position(chess.Board(), engine)
+        deep._evaluate_position(chess.Board(), engine)
+        assert engine.analysis.call_count == 2
+
+    def test_streaming_search_stops_at_requested_depth(self):
+        """The streaming search returns as soon as the requested depth is reached"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=0, engine_depth=2)
+        infos = [
+            {'depth': 1, 'score': chess.engine.PovScore(chess.engine.Cp(10), chess.WHITE)},
+            {'depth': 2, 'score': chess.engine.PovScore(chess.engine.Cp(40), chess.WHITE)},
+            {'depth': 3, 'score': chess.engine.PovScore(chess.engine.Cp(90), chess.WHITE)},
+        ]
+        engine = make_engine()
+        engine.analysis.return_value.__enter__.return_value = iter(infos)
+        
+        assert service._evaluate_position(chess.Board(), engine) == 40
+    
+    def test_blunder_search_stops_early_and_is_not_cached(self):
+        """A post-move search ends once the swing passes stop_above at the minimum depth"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        infos = [
+            {'depth': 6, 'score': chess.engine.PovScore(chess.engine.Cp(900), chess.WHITE)},
+            {'depth': 8, 'score': chess.engine.PovScore(chess.engine.Cp(700), chess.WHITE)},
+            {'depth': 12, 'score': chess.engine.PovScore(chess.engine.Cp(650), chess.WHITE)},
+        ]
+        engine = make_engine()
+        engine.analysis.return_value.__enter__.return_value = iter(infos)
+        
+        assert service._evaluate_with_best_move(chess.Board(), engine, stop_above=300)[0] == 700
+        
+        engine = make_engine(20)
+        assert service._evaluate_position(chess.Board(), engine) == 20
+        engine.analysis.assert_called_once()
+
+    def test_decided_search_stops_early_and_is_not_cached(self):
+        """A pre-move search ends once |score| passes stop_beyond at the minimum depth"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        infos = [
+            {'depth': 8, 'score': chess.engine.PovScore(chess.engine.Cp(-450), chess.WHITE)},
+            {'depth': 9, 'score': chess.engine.PovScore(chess.engine.Cp(-800), chess.WHITE)},
+            {'depth': 12, 'score': chess.engine.PovScore(chess.engine.Cp(-650), chess.WHITE)},
+        ]
+        engine = make_engine()
+        engine.analysis.return_value.__enter__.return_value = iter(infos)
+
+        assert service._evaluate_with_best_move(chess.Board(), engine, stop_beyond=600)[0] == -800
+
+        engine = make_engine(20)
+        assert service._evaluate_position(chess.Board(), engine) == 20
+        engine.analysis.assert_called_once()
+
+    def test_quiet_position_uses_reduced_budget(self):
+        """Quiet positions are searched with the reduced limit, tactical ones in full"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=40000)
+        engine = make_engine()
+        
+        service._evaluate_position(chess.Board(), engine)
+        assert engine.analysis.call_args[0][1] == chess.engine.Limit(nodes=10000)
+        
+        tactical = chess.Board()
+        for san in ['e4', 'd5']:
+            tactical.push_san(san)
+        service._evaluate_position(tactical, engine)
+        assert engine.analysis.call_args[0][1] == chess.engine.Limit(nodes=40000)
+        
+        service._evaluate_position(chess.Board(), engine, full_depth=True)
+        assert engine.analysis.call_args[0][1] == chess.engine.Limit(nodes=40000)
+
+    
+    def test_game_over_positions_skip_engine(self):
+        """Checkmate and stalemate are scored without an engine search"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine()
+        
+        mated = chess.Board()
+        for san in ['f3', 'e5', 'g4', 'Qh4#']:
+            mated.push_san(san)
+        stalemate = chess.Board('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+        
+        assert service._evaluate_position(mated, engine) == -service.MATE_SCORE
+        assert service._evaluate_position(stalemate, engine) == 0
+        engine.analysis.assert_not_called()
+
+    
+    def test_batch_searches_repeated_positions_once(self):
+        """Duplicate positions within a batch share one search"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine(5)
+        board = chess.Board()
+        board.push_san('e4')
+        
+        assert service._evaluate_positions_batch([board, board.copy(), chess.Board()], engine) == [(5, None)] * 3
+        assert engine.analysis.call_count == 2
+    
+    def test_batch_searches_latest_positions_first(self):
+        """Later positions are searched first, results come back in input order"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine(5)
+        boards = [chess.Board()]
+        for san in ['e4', 'e5']:
+            boards.append(boards[-1].copy())
+            boards[-1].push_san(san)
+        
+        assert service._evaluate_positions_batch(boards, engine) == [(5, None)] * 3
+        searched = [len(call[0][0].move_stack) for call in engine.analysis.call_args_list]
+        assert searched == [2, 1, 0]
+    
+    def test_best_move_skips_post_move_search(self):
+        """Playing the engine's best move is neutral without a second search"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, engine_nodes=0, engine_depth=10)
+        info = {'depth': 10, 'score': chess.engine.PovScore(chess.engine.Cp(30), chess.WHITE),
+                'pv': [chess.Move.from_uci('e2e4')]}
+        engine = make_engine()
+        engine.analysis.return_value.__enter__.return_value = [info]
+        
+        with patch.object(service, '_select_moves_to_analyze', return_value=bytearray([1])):
+            result = service.analyze_game_mistakes('1. e4 e5', 'white', engine=engine)
+        
+        assert engine.analysis.call_count == 1
+        assert result['early']['neutral_moves'] == 1
+
+    
+    def test_positions_sent_with_move_history(self):
+        """Searched positions carry the game's move stack (no bare FEN, warm engine hash)"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        engine = make_engine()
+        
+        with patch.object(service, '_select_moves_to_analyze', return_value=bytearray([0, 1])):
+            service.analyze_game_mistakes('1. e4 e5 2. Nf3 Nc6', 'white', engine=engine)
+        
+        searched = [call[0][0] for call in engine.analysis.call_args_list]
+        assert searched
+        assert all(board.move_stack for board in searched)
+        assert searched[0].move_stack[:2] == [chess.Move.from_uci('e2e4'), chess.Move.from_uci('e7e5')]
+
+
+class TestTablebase:
+    """Test that tablebase positions skip engine analysis (Iteration 13)"""
+
+    def test_endgame_is_scored_from_tablebase(self):
+        """Wins, draws and losses map to centipawns without an engine search"""
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        service.tablebase = Mock()
+        engine = make_engine(50)
+        board = chess.Board('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')
+
+        for wdl, expected in ((2, service.TABLEBASE_WIN_SCORE), (1, 0), (0, 0), (-2, -service.TABLEBASE_WIN_SCORE)):
+            service.tablebase.get_wdl.return_value = wdl
+            assert service._evaluate_with_best_move(board, engine) == (expected, None)
+        engine.analysis.assert_not_called()
+
+    def test_crowded_position_uses_engine(self):
+        """Positions beyond TABLEBASE_MAX_PIECES, or missing from the tables, are searched"""
+        clear_eval_cache()
+        service = MistakeAnalysisService(use_lichess_cloud=False)
+        service.tablebase = Mock()
+        service.tablebase.get_wdl.return_value = None
+
+        assert service._evaluate_position(chess.Board(), make_engine(30)) == 30
+        service.tablebase.get_wdl.assert_not_called()
+        assert service._evaluate_position(chess.Board('4k3/8/8/8/8/8/8/R3K3 b - - 0 1'), make_engine(-40)) == -40
+        clear_eval_cache()
+
+
+class TestOpeningBook:
+    """Test that book moves skip engine analysis (Iteration 13)"""
+    
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        clear_eval_cache()
+        yield
+        clear_eval_cache()
+        close_book_readers()
+    
+    @pytest.fixture
+    def book_path(self, tmp_path):
+        """Polyglot book containing only 1. e4 from the starting position"""
+        move = chess.Move.from_uci('e2e4')
+        raw_move = move.to_square | (move.from_square << 6)
+        path = tmp_path / 'book.bin'
+        path.write_bytes(struct.pack('>QHHI', chess.polyglot.zobrist_hash(chess.Board()), raw_move, 1, 0))
+        return str(path)
+    
+    def test_book_move_skips_engine(self, book_path):
+        """A move found in the book is counted as neutral without engine calls"""
+        service = MistakeAnalysisService(use_lichess_cloud=False, book_path=book_path)
+        service._open_book()
+        engine = make_engine(0)
+        
+        result = service.analyze_game_mistakes('1. e4 e5 2. Nf3 *', 'white', engine=engine)
+        
+        # 1. e4 is in book (no engine calls); 2. Nf3 is evaluated before and after
+        assert engine.analysis.call_count == 2
+        assert result['early']['total_moves'] == 2
+        assert result['early']['neutral_moves'] == 2
+        service._close_book()
+        assert service.book is None
+    
+    def test_book_is_shared_across_services(self, book_path):
+        """Services created per request reuse the book opened by an earlier one"""
+        first = MistakeAnalysisService(book_path=book_path)
+        first._open_book()
+        first._close_book()
+        
+        with patch('chess.polyglot.open_reader') as open_reader:
+            second = MistakeAnalysisService(book_path=book_path)
+            second._open_book()
+        
+        open_reader.assert_not_called()
+        assert second._is_book_move(chess.Board(), chess.Move.from_uci('e2e4'))
+
+
+class TestMainlineParsing:
+    """Test mainline-only PGN parsing (Iteration 13)"""
+    
+    def test_skips_variations_and_comments(self):
+        """Only mainline moves are collected"""
+        pgn = '1. e4 {[%clk 0:02:59.9]} e5 (1... c5 2. Nf3) 2. Nf3 $1 Nc6 *'
+        board, moves = chess.pgn.read_game(StringIO(pgn), Visitor=MainlineMovesVisitor)
+        
+        assert board == chess.Board()
+        assert [m.uci() for m in moves] == ['e2e4', 'e7e5', 'g1f3', 'b8c6']
+    
+    def test_honours_fen_header(self):
+        """Games starting from a custom position keep that starting board"""
+        fen = '4k3/8/8/8/8/8/4P3/4K3 w - - 0 1'
+        pgn = f'[SetUp "1"]\n[FEN "{fen}"]\n\n1. e4 Kd7 *'
+        board, moves = chess.pgn.read_game(StringIO(pgn), Visitor=MainlineMovesVisitor)
+        
+        assert board.fen() == fen
+        assert len(moves) == 2
+    
+    @pytest.mark.parametrize('pgn', [
+        '[Event "Live Chess"]\n[Date "2024.01.01"]\n\n1. e4 {[%clk 0:02:59.9]} 1... e5 {[%clk 0:02:58]} 2. Nf3 1-0',
+        '1.e4! e5?! 2. Nf3 $1 Nc6 3. Bb5 a6 4. O-O *',
+        '[SetUp "1"]\n[FEN "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1"]\n\n1. e4 Kd7 2. e5 *',
+        '1. e4 e5 (1... c5 2. Nf3) 2. Nf3 *',
+        '1. e4 e5 2. Qxf7 Ke7 *',
+    ])
+    def test_fast_path_matches_visitor(self, pgn):
+        """parse_mainline returns what the visitor-based parser returns"""
+        fast_board, fast_moves = parse_mainline(pgn)
+        board, moves = chess.pgn.read_game(StringIO(pgn), Visitor=MainlineMovesVisitor)
+        
+        assert fast_board.fen() == board.fen()
+        assert fast_moves == moves
+    
+    def test_empty_pgn(self):
+        assert parse_mainline('') is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
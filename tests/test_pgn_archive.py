@@ -0,0 +1,51 @@
+"""
+Unit tests for the memory-mapped PGN archive reader.
+Iteration 13: Byte-level game splitting for concatenated archives
+"""
+from app.utils.pgn_archive import archive_game_record, iter_archive_pgns
+
+GAME_1 = '''[Event "Live Chess"]
+[White "alice"]
+[Black "bob"]
+[Result "0-1"]
+[TimeControl "600"]
+[Termination "bob won by resignation"]
+[Link "https://www.chess.com/game/live/1"]
+
+1. f3 e5 2. g4 Qh4# 0-1'''
+
+GAME_2 = '''[Event "Live Chess"]
+[White "bob"]
+[Black "alice"]
+[Result "1/2-1/2"]
+
+1. e4 e5 1/2-1/2'''
+
+
+class TestPgnArchive:
+    """Test cases for archive splitting and header records."""
+    
+    def test_splits_concatenated_games(self, tmp_path):
+        """Each game is yielded exactly once with its own headers and moves."""
+        path = tmp_path / 'archive.pgn'
+        path.write_text(GAME_1 + '\n\n' + GAME_2 + '\n')
+        
+        assert list(iter_archive_pgns(str(path))) == [GAME_1, GAME_2]
+    
+    def test_empty_archive(self, tmp_path):
+        """An empty file yields no games."""
+        path = tmp_path / 'empty.pgn'
+        path.write_bytes(b'')
+        
+        assert list(iter_archive_pgns(str(path))) == []
+    
+    def test_game_record_from_headers(self):
+        """Headers map to a Chess.com API-style game dictionary."""
+        record = archive_game_record(GAME_1)
+        
+        assert record['url'] == 'https://www.chess.com/game/live/1'
+        assert record['time_control'] == '600'
+        assert record['white']['username'] == 'alice'
+        assert record['white']['result'] == 'resigned'
+        assert record['black']['result'] == 'win'
+        assert archive_game_record(GAME_2)['black']['result'] == 'agreed'